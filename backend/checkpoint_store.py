@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from file_utils import write_json_atomic
+
+class CheckpointStore:
+    """Durable per-chunk progress records for /process so a failed load can resume"""
+
+    def __init__(self, checkpoint_folder='checkpoints'):
+        self.checkpoint_folder = checkpoint_folder
+        os.makedirs(checkpoint_folder, exist_ok=True)
+
+    def fingerprint(self, file_path):
+        """Hash the file contents so a re-uploaded or edited file never reuses a stale checkpoint"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return f"{os.path.getsize(file_path)}-{digest.hexdigest()}"
+
+    def _path(self, fingerprint):
+        return os.path.join(self.checkpoint_folder, f"{fingerprint}.json")
+
+    def load(self, fingerprint):
+        """Return the saved checkpoint for this fingerprint, or None if the file was never started"""
+        path = self._path(fingerprint)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable checkpoint {path}: {str(e)}")
+            return None
+
+    def start(self, fingerprint, filename, chunk_size):
+        checkpoint = {
+            'fingerprint': fingerprint,
+            'filename': filename,
+            'chunk_size': chunk_size,
+            'last_committed_chunk': -1,
+            'clean_rows': 0,
+            'dirty_rows_flushed': 0,
+            'merged_rows': 0,
+            'pending_chunk': None,
+            'started_at': datetime.now().isoformat(),
+            'updated_at': datetime.now().isoformat()
+        }
+        self._write(checkpoint)
+        return checkpoint
+
+    def stage_chunk(self, checkpoint, chunk_index, clean_rows, dirty_rows, merged_rows=0):
+        """
+        Record that a chunk's clean rows reached Supabase. Its dirty rows are kept here until
+        they are flushed too, so a retry writes only the ones still missing (dirtydata has no
+        natural key, so a replayed dirty row would be a duplicate)
+        """
+        checkpoint['pending_chunk'] = {
+            'index': chunk_index,
+            'clean_rows': clean_rows,
+            'merged_rows': merged_rows,
+            'dirty_rows': dirty_rows,
+            'dirty_flushed': 0
+        }
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        self._write(checkpoint)
+
+    def record_dirty_flushed(self, checkpoint, count):
+        checkpoint['pending_chunk']['dirty_flushed'] += count
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        self._write(checkpoint)
+
+    def commit_chunk(self, checkpoint):
+        """Record the staged chunk as fully written upstream (clean rows and all of its dirty rows)"""
+        pending = checkpoint['pending_chunk']
+        checkpoint['pending_chunk'] = None
+        checkpoint['last_committed_chunk'] = pending['index']
+        checkpoint['clean_rows'] += pending['clean_rows']
+        checkpoint['dirty_rows_flushed'] += len(pending['dirty_rows'])
+        checkpoint['merged_rows'] += pending['merged_rows']
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        self._write(checkpoint)
+
+    def clear(self, fingerprint):
+        path = self._path(fingerprint)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _write(self, checkpoint):
+        # Atomic so a crash never leaves a half-written checkpoint
+        write_json_atomic(self._path(checkpoint['fingerprint']), checkpoint, default=str)
@@ -18,8 +18,22 @@ class DataCleaner:
         # Valid pattern: P followed by 4-5 digits
         self.valid_passenger_pattern = r'^P\d{4,5}$'
         
+        # Malformed PassengerKey shapes recognized by transform_complex_passenger_key, in match order
+        # (applied to the key with spaces removed and uppercased)
+        self.complex_passenger_key_patterns = {
+            'PXlettersY': r'^P(\d+)[A-Z]+(\d+)$',
+            'PXletters-Y': r'^P(\d+)[A-Z]+-(\d+)$',
+            'PXPY': r'^P(\d+)P?(\d+)$',
+            'PXtext:Y': r'^P(\d+)[A-Z]+:?\s*(\d+)$'
+        }
+        
+        self.email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        
         # Track the highest passenger number to ensure proper incrementing
         self.highest_passenger_number = 0
+        
+        # (original, new) PassengerKey pairs changed by the last clean_passengers_data call
+        self.key_transformations = []
     
     def clean_passengers_data(self, df, existing_passenger_keys=None):
         """Clean passengers data with correct columns: PassengerKey, FullName, Email, LoyaltyStatus"""
@@ -31,6 +45,7 @@ class DataCleaner:
         self._find_highest_passenger_number(existing_keys)
         
         current_keys = set(existing_keys)
+        self.key_transformations = []
         
         for index, row in df.iterrows():
             try:
@@ -82,6 +97,7 @@ class DataCleaner:
                 
                 # Show transformation if key was changed
                 if str(original_key) != passenger_key:
+                    self.key_transformations.append((original_key, passenger_key))
                     print(f"🔄 Transformed '{original_key}' → '{passenger_key}'")
                 
             except Exception as e:
@@ -100,8 +116,7 @@ class DataCleaner:
         email = str(email).strip().lower()
         
         # Basic email pattern check
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if re.match(email_pattern, email):
+        if re.match(self.email_pattern, email):
             return email
         else:
             print(f"⚠️ Invalid email format: {email}")
@@ -175,7 +190,7 @@ class DataCleaner:
         clean_key = invalid_key.replace(' ', '').upper()
         
         # Pattern 1: P1L1592 → Extract numbers after P: 1 and 1592
-        match1 = re.match(r'^P(\d+)[A-Z]+(\d+)$', clean_key)
+        match1 = re.match(self.complex_passenger_key_patterns['PXlettersY'], clean_key)
         if match1:
             num1, num2 = match1.groups()
             # Use the larger number or a combination
@@ -186,7 +201,7 @@ class DataCleaner:
                 return candidate
         
         # Pattern 2: P1VII-1798 → Extract numbers around Roman numerals and dash
-        match2 = re.match(r'^P(\d+)[A-Z]+-(\d+)$', clean_key)
+        match2 = re.match(self.complex_passenger_key_patterns['PXletters-Y'], clean_key)
         if match2:
             num1, num2 = match2.groups()
             candidate_num = max(int(num1), int(num2))
@@ -196,7 +211,7 @@ class DataCleaner:
                 return candidate
         
         # Pattern 3: P1P1937 → Already has P, extract the significant number
-        match3 = re.match(r'^P(\d+)P?(\d+)$', clean_key)
+        match3 = re.match(self.complex_passenger_key_patterns['PXPY'], clean_key)
         if match3:
             num1, num2 = match3.groups()
             # Use the second number as it's likely the significant one
@@ -206,7 +221,7 @@ class DataCleaner:
                 return candidate
         
         # Pattern 4: P2Note: 2758 → Extract number after colon/space
-        match4 = re.match(r'^P(\d+)[A-Z]+:?\s*(\d+)$', clean_key)
+        match4 = re.match(self.complex_passenger_key_patterns['PXtext:Y'], clean_key)
         if match4:
             num1, num2 = match4.groups()
             candidate = f"P{num2}"
@@ -0,0 +1,166 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Columns checked against dimension keys, per feed type (see detect_table_type in main.py)
+FK_CHECKS = {
+    'flight': {'OriginAirportKey': 'airports', 'DestinationAirportKey': 'airports'},
+    'sales': {'PassengerKey': 'passengers', 'FlightKey': 'flights', 'DateKey': 'dates'}
+}
+REFERENCE_KEY_COLUMNS = {
+    'airports': ['airportkey', 'AirportKey'],
+    'passengers': ['passengerkey', 'PassengerKey'],
+    'flights': ['flightkey', 'FlightKey'],
+    'dates': ['datekey', 'DateKey']
+}
+
+class DistinctSketch:
+    """K-minimum-values sketch: mergeable, vectorized distinct-count estimate in O(k) memory"""
+
+    def __init__(self, k=1024):
+        self.k = k
+        self.values = np.empty(0, dtype=np.uint64)
+
+    def update(self, series):
+        series = series.dropna()
+        if series.empty:
+            return
+        hashes = pd.util.hash_pandas_object(series.astype(str), index=False).to_numpy(dtype=np.uint64)
+        merged = np.unique(np.concatenate([self.values, hashes]))
+        self.values = merged[:self.k]
+
+    def estimate(self):
+        if len(self.values) < self.k:
+            return int(len(self.values))
+        return int((self.k - 1) * (2.0 ** 64) / float(self.values[-1]))
+
+class DataProfiler:
+    """
+    Single streaming pass over an uploaded CSV that reports how dirty it is before DataCleaner
+    runs: null rates, PassengerKey/Email pattern classes, distinct counts, numeric ranges and
+    FK-miss counts. Every statistic is computed per chunk with vectorized pandas operations and
+    merged, so the cost is close to one read_csv of the file.
+    """
+
+    def __init__(self, cleaner, chunk_size=100000):
+        self.cleaner = cleaner
+        self.chunk_size = chunk_size
+
+    def profile(self, file_path, table_type=None, reference=None):
+        """reference: {'airports'|'passengers'|'flights'|'dates': DataFrame} for FK checks"""
+        started = time.perf_counter()
+        fk_keys = self._reference_keys(table_type, reference or {})
+        rows = 0
+        columns = {}
+        patterns = {}
+        fk_misses = {column: 0 for column in FK_CHECKS.get(table_type, {}) if column in fk_keys}
+
+        for df in pd.read_csv(file_path, chunksize=self.chunk_size):
+            rows += len(df)
+            for column in df.columns:
+                stats = columns.setdefault(column, {'nulls': 0, 'sketch': DistinctSketch(), 'numeric_count': 0, 'min': None, 'max': None, 'sum': 0.0})
+                series = df[column]
+                stats['nulls'] += int(series.isna().sum())
+                stats['sketch'].update(series)
+                numeric = series if series.dtype.kind in 'iuf' else pd.to_numeric(series, errors='coerce')
+                numeric = numeric.dropna()
+                if not numeric.empty:
+                    stats['numeric_count'] += len(numeric)
+                    stats['sum'] += float(numeric.sum())
+                    chunk_min, chunk_max = float(numeric.min()), float(numeric.max())
+                    stats['min'] = chunk_min if stats['min'] is None else min(stats['min'], chunk_min)
+                    stats['max'] = chunk_max if stats['max'] is None else max(stats['max'], chunk_max)
+
+            if 'PassengerKey' in df.columns:
+                self._add_counts(patterns.setdefault('PassengerKey', {}), self._passenger_key_classes(df['PassengerKey']))
+            if 'Email' in df.columns:
+                self._add_counts(patterns.setdefault('Email', {}), self._email_classes(df['Email']))
+            for column in fk_misses:
+                if column in df.columns:
+                    values = self._normalize_keys(column, df[column].dropna())
+                    fk_misses[column] += int((~values.isin(fk_keys[column])).sum())
+
+        report = {
+            'file': file_path,
+            'table_type': table_type,
+            'rows': rows,
+            'columns': {column: self._column_report(stats, rows) for column, stats in columns.items()},
+            'patterns': patterns,
+            'fk_misses': {
+                column: {'misses': misses, 'miss_rate': round(misses / rows, 4) if rows else 0}
+                for column, misses in fk_misses.items()
+            },
+            'elapsed_seconds': round(time.perf_counter() - started, 3)
+        }
+        print(f"🔬 Profiled {file_path}: {rows} rows, {len(columns)} columns in {report['elapsed_seconds']}s")
+        return report
+
+    def _passenger_key_classes(self, series):
+        """Classify keys the same way clean_and_generate_passenger_key_advanced tries them, vectorized"""
+        missing = series.isna() | (series.astype(str).str.strip() == '')
+        stripped = series.astype(str).str.strip()
+        valid = ~missing & stripped.str.match(self.cleaner.valid_passenger_pattern)
+        compact = stripped.str.replace(' ', '', regex=False).str.upper()
+        classified = missing | valid
+        counts = {'missing': int(missing.sum()), 'valid': int(valid.sum())}
+        for name, pattern in self.cleaner.complex_passenger_key_patterns.items():
+            matched = ~classified & compact.str.match(pattern)
+            counts[name] = int(matched.sum())
+            classified |= matched
+        has_digits = ~classified & compact.str.contains(r'\d', regex=True)
+        counts['other_with_digits'] = int(has_digits.sum())
+        counts['no_digits'] = int((~classified & ~has_digits).sum())
+        return counts
+
+    def _email_classes(self, series):
+        missing = series.isna() | (series.astype(str).str.strip() == '')
+        valid = ~missing & series.astype(str).str.strip().str.lower().str.match(self.cleaner.email_pattern)
+        return {'missing': int(missing.sum()), 'valid': int(valid.sum()), 'invalid': int((~missing & ~valid).sum())}
+
+    def _add_counts(self, totals, counts):
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+
+    def _column_report(self, stats, rows):
+        report = {
+            'nulls': stats['nulls'],
+            'null_rate': round(stats['nulls'] / rows, 4) if rows else 0,
+            'distinct_estimate': stats['sketch'].estimate()
+        }
+        non_null = rows - stats['nulls']
+        # Only report a numeric range when most non-null values actually parse as numbers
+        if stats['numeric_count'] and stats['numeric_count'] >= 0.5 * non_null:
+            report['numeric'] = {
+                'min': stats['min'],
+                'max': stats['max'],
+                'mean': round(stats['sum'] / stats['numeric_count'], 4),
+                'non_numeric': non_null - stats['numeric_count']
+            }
+        return report
+
+    def _reference_keys(self, table_type, reference):
+        keys = {}
+        for column, reference_name in FK_CHECKS.get(table_type, {}).items():
+            reference_df = reference.get(reference_name)
+            if reference_df is None:
+                continue
+            if reference_df.empty:
+                # DataCleaner would reject every row against an empty dimension
+                keys[column] = set()
+                continue
+            for key_column in REFERENCE_KEY_COLUMNS[reference_name]:
+                if key_column in reference_df.columns:
+                    keys[column] = set(self._normalize_keys(column, reference_df[key_column].dropna()))
+                    break
+        return keys
+
+    def _normalize_keys(self, column, values):
+        """Mirror the key cleanup DataCleaner applies before its FK lookups"""
+        if column == 'DateKey':
+            # Unparseable dates become '<NA>', which never matches and so counts as a miss
+            numeric = pd.to_numeric(values, errors='coerce')
+            return numeric.where(numeric % 1 == 0).astype('Int64').astype(str)
+        values = values.astype(str).str.strip()
+        if column in ['OriginAirportKey', 'DestinationAirportKey']:
+            return values.str.upper()
+        return values
@@ -0,0 +1,232 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import numpy as np
+import pandas as pd
+from file_utils import atomic_write, write_json_atomic
+
+MAGIC = b'DWSNAP1\n'
+ALIGNMENT = 8
+
+class DimensionSnapshot:
+    """
+    Versioned, read-only columnar snapshot of the dimension tables shared by all API workers.
+
+    One worker publishes a snapshot file after a load commits; every worker memory-maps the
+    current version, so column buffers live once in the OS page cache instead of once per
+    worker, and Supabase is read once per publish instead of once per worker per job.
+    Numeric columns are read as zero-copy views; string columns are decoded per call, so
+    callers ask only for the columns they need. Rows added to Supabase outside this API (e.g.
+    dimdate) only appear after a publish, so a version older than max_age_seconds is reported
+    stale and the processor republishes it.
+
+    File layout: MAGIC, uint64 header length, JSON header, then 8-byte aligned column buffers.
+    Numeric columns are raw little-endian arrays; string columns are an int64 offsets array,
+    a UTF-8 data buffer and a uint8 validity mask (Arrow style).
+    """
+
+    def __init__(self, snapshot_folder='snapshots', keep_versions=3, max_age_seconds=None):
+        self.snapshot_folder = snapshot_folder
+        self.keep_versions = keep_versions
+        self.max_age_seconds = max_age_seconds
+        self.current_path = os.path.join(snapshot_folder, 'CURRENT')
+        self._lock = threading.Lock()
+        self._mapped = None
+        os.makedirs(snapshot_folder, exist_ok=True)
+
+    # ---------- publishing ----------
+
+    def publish(self, tables):
+        """Write {table_name: DataFrame} as a new version and atomically make it current"""
+        version = time.time_ns()
+        header = {'version': version, 'created_at': time.time(), 'tables': {}}
+        buffers = []
+        position = 0
+
+        def add_buffer(data):
+            nonlocal position
+            offset = position
+            buffers.append(data)
+            position += len(data)
+            padding = (-position) % ALIGNMENT
+            if padding:
+                buffers.append(b'\0' * padding)
+                position += padding
+            return [offset, len(data)]
+
+        for table_name, df in tables.items():
+            columns = []
+            for column in df.columns:
+                columns.append(self._encode_column(column, df[column], add_buffer))
+            header['tables'][table_name] = {'rows': len(df), 'columns': columns}
+
+        header_bytes = json.dumps(header).encode('utf-8')
+        # Buffer offsets in the header are relative to the aligned data section after it
+        prefix_padding = (-(len(MAGIC) + 8 + len(header_bytes))) % ALIGNMENT
+
+        path = os.path.join(self.snapshot_folder, f"dimensions-{version}.snap")
+        with atomic_write(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * prefix_padding)
+            for data in buffers:
+                f.write(data)
+        self._write_current(version)
+        self._remove_old_versions()
+        print(f"📸 Published dimension snapshot v{version} ({', '.join(tables)})")
+        return version
+
+    def _encode_column(self, name, series, add_buffer):
+        kind = series.dtype.kind
+        if kind == 'b':
+            return {'name': name, 'type': 'bool', 'data': add_buffer(series.to_numpy(dtype='uint8').tobytes())}
+        if kind in 'iu':
+            return {'name': name, 'type': 'int64', 'data': add_buffer(series.to_numpy(dtype='<i8').tobytes())}
+        if kind == 'f':
+            return {'name': name, 'type': 'float64', 'data': add_buffer(series.to_numpy(dtype='<f8').tobytes())}
+
+        validity = np.zeros(len(series), dtype='uint8')
+        offsets = np.zeros(len(series) + 1, dtype='<i8')
+        encoded = []
+        total = 0
+        for i, value in enumerate(series.tolist()):
+            if value is not None and not (isinstance(value, float) and pd.isna(value)):
+                raw = str(value).encode('utf-8')
+                encoded.append(raw)
+                total += len(raw)
+                validity[i] = 1
+            offsets[i + 1] = total
+        return {
+            'name': name,
+            'type': 'string',
+            'offsets': add_buffer(offsets.tobytes()),
+            'data': add_buffer(b''.join(encoded)),
+            'validity': add_buffer(validity.tobytes())
+        }
+
+    def _write_current(self, version):
+        write_json_atomic(self.current_path, {'version': version})
+
+    def _remove_old_versions(self):
+        # Unlinking is safe for workers still mapping an old version; the pages stay valid until unmapped
+        snapshots = sorted(
+            name for name in os.listdir(self.snapshot_folder)
+            if name.startswith('dimensions-') and name.endswith('.snap')
+        )
+        for name in snapshots[:-self.keep_versions]:
+            try:
+                os.remove(os.path.join(self.snapshot_folder, name))
+            except OSError:
+                pass
+
+    # ---------- reading ----------
+
+    def current_version(self):
+        try:
+            with open(self.current_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_stale(self):
+        """True when the current version was published more than max_age_seconds ago"""
+        current = self.current_version()
+        if current is None or not self.max_age_seconds:
+            return False
+        # Versions are publish times in nanoseconds
+        return time.time() - current['version'] / 1e9 > self.max_age_seconds
+
+    def _acquire(self):
+        """Return the mapped current version, swapping to a newer one if it was published"""
+        current = self.current_version()
+        if current is None:
+            return None
+        mapped = self._mapped
+        if mapped is not None and mapped['version'] == current['version']:
+            return mapped
+
+        with self._lock:
+            if self._mapped is not None and self._mapped['version'] == current['version']:
+                return self._mapped
+            path = os.path.join(self.snapshot_folder, f"dimensions-{current['version']}.snap")
+            try:
+                with open(path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not map dimension snapshot v{current['version']}: {str(e)}")
+                return self._mapped
+            if mm[:len(MAGIC)] != MAGIC:
+                print(f"⚠️ Ignoring corrupt dimension snapshot {path}")
+                return self._mapped
+            (header_length,) = struct.unpack_from('<Q', mm, len(MAGIC))
+            header_start = len(MAGIC) + 8
+            header = json.loads(mm[header_start:header_start + header_length].decode('utf-8'))
+            data_start = header_start + header_length
+            data_start += (-data_start) % ALIGNMENT
+            # Single reference assignment: readers see either the old or the new version, never a mix.
+            # The old mmap is not closed explicitly; it is released once no request still uses its views.
+            self._mapped = {'version': current['version'], 'mm': mm, 'header': header, 'data_start': data_start}
+            print(f"🔁 Mapped dimension snapshot v{current['version']}")
+            return self._mapped
+
+    def column(self, table_name, column_name):
+        """Zero-copy numpy view for numeric columns; decoded list for string columns"""
+        mapped = self._acquire()
+        if mapped is None:
+            return None
+        table = mapped['header']['tables'].get(table_name)
+        if table is None:
+            return None
+        for column in table['columns']:
+            if column['name'] == column_name:
+                return self._decode_column(mapped, column, table['rows'])
+        return None
+
+    def read_table(self, table_name, columns=None):
+        """Return a DataFrame of the requested columns (default all), or None if no snapshot contains it"""
+        mapped = self._acquire()
+        if mapped is None:
+            return None
+        table = mapped['header']['tables'].get(table_name)
+        if table is None:
+            return None
+        selected = [column for column in table['columns'] if columns is None or column['name'] in columns]
+        data = {column['name']: self._decode_column(mapped, column, table['rows']) for column in selected}
+        return pd.DataFrame(data, columns=[column['name'] for column in selected])
+
+    def invalidate(self):
+        """Stop serving the current version; readers fall back to Supabase until the next publish"""
+        try:
+            os.remove(self.current_path)
+            print("🗑️ Invalidated dimension snapshot")
+        except FileNotFoundError:
+            pass
+
+    def _view(self, mapped, buffer, dtype):
+        offset, length = buffer
+        itemsize = np.dtype(dtype).itemsize
+        return np.frombuffer(mapped['mm'], dtype=dtype, count=length // itemsize, offset=mapped['data_start'] + offset)
+
+    def _decode_column(self, mapped, column, rows):
+        if column['type'] == 'bool':
+            return self._view(mapped, column['data'], 'uint8').astype(bool)
+        if column['type'] == 'int64':
+            return self._view(mapped, column['data'], '<i8')
+        if column['type'] == 'float64':
+            return self._view(mapped, column['data'], '<f8')
+
+        offsets = self._view(mapped, column['offsets'], '<i8')
+        validity = self._view(mapped, column['validity'], 'uint8')
+        data_offset = mapped['data_start'] + column['data'][0]
+        data = memoryview(mapped['mm'])[data_offset:data_offset + column['data'][1]]
+        values = []
+        for i in range(rows):
+            if validity[i]:
+                values.append(bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8'))
+            else:
+                values.append(None)
+        return values
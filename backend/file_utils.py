@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server only
+    fcntl = None
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Write path through a temp file that is fsynced and renamed over it on a clean exit, so
+    readers and crashes only ever see the old file or the whole new one
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_json_atomic(path, data, **dump_options):
+    with atomic_write(path) as f:
+        json.dump(data, f, **dump_options)
+
+class FileLock:
+    """
+    Serializes a critical section across threads (thread_lock) and worker processes (flock on
+    lock_path); readers may take it shared. Threads only without fcntl.
+    """
+
+    def __init__(self, lock_path, thread_lock=None, shared=False):
+        self.lock_path = lock_path
+        self.thread_lock = thread_lock if thread_lock is not None else threading.Lock()
+        self.shared = shared
+        self.handle = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            self.handle = open(self.lock_path, 'a')
+            if fcntl:
+                fcntl.flock(self.handle, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        except BaseException:
+            if self.handle:
+                self.handle.close()
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+        self.thread_lock.release()
@@ -0,0 +1,391 @@
+"""
+Latency/throughput load test for the serving endpoints.
+
+Starts a local stand-in for the Supabase REST API (with injectable latency and error rate) and
+main.py's Flask app as separate processes (SUPABASE_URL points the app at the stand-in), then
+replays a weighted request mix from concurrent clients in their own process(es), optionally
+while /process jobs run, and prints p50/p95/p99 latency, throughput and error rate per endpoint
+as JSON, so results can be diffed between releases. Keeping the harness out of the API's
+interpreter means its own GIL contention never shows up as endpoint latency.
+
+    python load_test.py --duration 30 --concurrency 16 --mix home=2,stats=1,check-eligibility=7 \\
+        --upstream-latency-ms 40 --upstream-error-rate 0.01 --with-process --output results.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+import requests
+
+ENDPOINTS = {
+    'home': ('GET', '/'),
+    'stats': ('GET', '/stats'),
+    'check-eligibility': ('POST', '/check-eligibility'),
+    'analytics': ('GET', '/analytics/month')
+}
+
+class FakeSupabase:
+    """In-memory tables behind a PostgREST-shaped HTTP API (eq./ilike. filters, limit/offset, POST)"""
+
+    def __init__(self, latency_ms=0.0, error_rate=0.0, seed=7):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.server = None
+
+    def seed(self, passengers=2000, flights=200, days=60):
+        rng = self.random
+        airports = ['JFK', 'LAX', 'ORD', 'LHR', 'NRT', 'SYD', 'DXB', 'CDG']
+        airlines = ['AA', 'DL', 'UA', 'BA', 'JL']
+        self.tables['dimairports'] = [{'airportkey': key, 'airportname': f'{key} Intl', 'city': key, 'country': 'United States', 'region': 'North America'} for key in airports]
+        self.tables['dimairlines'] = [{'airlinekey': key, 'airlinename': f'{key} Airways', 'alliance': 'None'} for key in airlines]
+        self.tables['dimpassengers'] = [
+            {'passengerkey': f'P{1001 + i}', 'fullname': f'Passenger {i}', 'email': f'passenger{i}@example.com', 'loyaltystatus': rng.choice(['Bronze', 'Silver', 'Gold', 'Platinum'])}
+            for i in range(passengers)
+        ]
+        self.tables['dimflights'] = []
+        for i in range(flights):
+            origin, destination = rng.sample(airports, 2)
+            airline = rng.choice(airlines)
+            self.tables['dimflights'].append({'flightkey': f'{airline}{100 + i}', 'originairportkey': origin, 'destinationairportkey': destination, 'aircrafttype': 'A320', 'airlinekey': airline})
+        self.tables['dimdate'] = [{'datekey': 20240100 + (d // 28) * 100 + (d % 28) + 1} for d in range(days)]
+        self.tables['factsales'] = []
+        for i in range(passengers * 2):
+            delay = rng.choice([0, 15, 60, 300])
+            baggage = rng.choice(['Delivered', 'Delivered', 'Delivered', 'Lost', 'Damaged'])
+            self.tables['factsales'].append({
+                'transactionid': i + 1,
+                'datekey': rng.choice(self.tables['dimdate'])['datekey'],
+                'passengerkey': rng.choice(self.tables['dimpassengers'])['passengerkey'],
+                'flightkey': rng.choice(self.tables['dimflights'])['flightkey'],
+                'ticketprice': 200.0, 'taxes': 20.0, 'baggagefees': 30.0, 'totalamount': 250.0,
+                'flightdelay': delay, 'baggagestatus': baggage,
+                'iseligibleforinsurance': delay > 240 or baggage in ['Lost', 'Damaged']
+            })
+        self.tables['dirtydata'] = []
+
+    def query(self, table, params):
+        rows = self.tables.get(table)
+        if rows is None:
+            return None
+        with self.lock:
+            rows = list(rows)
+        for column, condition in params.items():
+            if column in ['limit', 'offset', 'order', 'select', 'and']:
+                continue
+            operator, _, value = condition.partition('.')
+            if operator == 'eq':
+                rows = [row for row in rows if str(row.get(column)) == value]
+            elif operator == 'ilike':
+                needle = value.strip('%').lower()
+                rows = [row for row in rows if needle in str(row.get(column, '')).lower()]
+        offset = int(params.get('offset', 0))
+        if 'limit' in params:
+            return rows[offset:offset + int(params['limit'])], len(rows)
+        return rows[offset:], len(rows)
+
+    def insert(self, table, rows, on_conflict=None):
+        """Append rows; with on_conflict, rows whose key already exists are ignored. Returns inserted rows"""
+        with self.lock:
+            existing = self.tables.setdefault(table, [])
+            if on_conflict:
+                keys = {str(row.get(on_conflict)) for row in existing}
+                rows = [row for row in rows if str(row.get(on_conflict)) not in keys]
+            existing.extend(rows)
+            return rows
+
+    def start(self, port=0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _delay_or_fail(self):
+                if fake.latency_ms:
+                    time.sleep(fake.random.expovariate(1.0 / fake.latency_ms) / 1000.0)
+                if fake.error_rate and fake.random.random() < fake.error_rate:
+                    self._send(503, {'message': 'injected upstream error'})
+                    return True
+                return False
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self._delay_or_fail():
+                    return
+                url = urlparse(self.path)
+                table = url.path.rsplit('/', 1)[-1]
+                result = fake.query(table, dict(parse_qsl(url.query)))
+                if result is None:
+                    self._send(404, {'message': f'relation {table} does not exist'})
+                    return
+                rows, total = result
+                self._send(200, rows, {'Content-Range': f'0-{max(len(rows) - 1, 0)}/{total}'})
+
+            def do_POST(self):
+                if self._delay_or_fail():
+                    return
+                url = urlparse(self.path)
+                table = url.path.rsplit('/', 1)[-1]
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                    inserted = fake.insert(table, body if isinstance(body, list) else [body], dict(parse_qsl(url.query)).get('on_conflict'))
+                except ValueError as e:
+                    # PostgREST answers a malformed body or a row violating a constraint with 400
+                    self._send(400, {'message': str(e)})
+                    return
+                if 'return=representation' in self.headers.get('Prefer', ''):
+                    self._send(201, inserted)
+                    return
+                self.send_response(201)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(samples, elapsed):
+    """samples: {endpoint: [(latency_seconds, outcome)]} with outcome 'ok', 'client_error' (4xx) or 'error'"""
+    report = {}
+    for name, entries in samples.items():
+        latencies = sorted(latency for latency, _ in entries)
+        errors = sum(1 for _, outcome in entries if outcome == 'error')
+        client_errors = sum(1 for _, outcome in entries if outcome == 'client_error')
+        report[name] = {
+            'requests': len(entries),
+            'errors': errors,
+            'error_rate': round(errors / len(entries), 4) if entries else 0,
+            'client_errors': client_errors,
+            'client_error_rate': round(client_errors / len(entries), 4) if entries else 0,
+            'throughput_rps': round(len(entries) / elapsed, 2) if elapsed else 0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else None
+        }
+    return report
+
+def outcome(status_code, system_error=False):
+    if status_code >= 500 or system_error:
+        return 'error'
+    if status_code >= 400:
+        return 'client_error'
+    return 'ok'
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix; choose from {sorted(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def write_process_file(path, rows):
+    """Synthetic passengers feed (with some malformed keys) for the concurrent /process job"""
+    rng = random.Random(11)
+    with open(path, 'w') as f:
+        f.write('PassengerKey,FullName,Email,LoyaltyStatus\n')
+        for i in range(rows):
+            key = f'P{50000 + i}' if rng.random() > 0.1 else f'P1L{50000 + i}'
+            f.write(f'{key},Load Test {i},loadtest{i}@example.com,{rng.choice(["gold", "s", "Bronze", ""])}\n')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Process for {url} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout}s")
+
+def serve_fake(args):
+    fake = FakeSupabase(args.upstream_latency_ms, args.upstream_error_rate)
+    fake.seed()
+    fake.start(args.port)
+    threading.Event().wait()
+
+def run_clients(base_url, weights, duration, threads, seed_offset, with_process, process_rows, upload_folder):
+    """Client side of the test, run in its own process; returns {endpoint: [(latency, outcome)]}"""
+    # Same seed as the stand-in process, so request bodies reference rows it actually has
+    fake = FakeSupabase()
+    fake.seed()
+    sales = fake.tables['factsales']
+    names = {row['passengerkey']: row['fullname'] for row in fake.tables['dimpassengers']}
+    samples = {name: [] for name in weights}
+    samples_lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def record(name, started, result):
+        with samples_lock:
+            samples.setdefault(name, []).append((time.perf_counter() - started, result))
+
+    def client(worker_id):
+        rng = random.Random(worker_id)
+        session = requests.Session()
+        choices, choice_weights = list(weights), list(weights.values())
+        while time.perf_counter() < stop_at:
+            name = rng.choices(choices, choice_weights)[0]
+            method, path = ENDPOINTS[name]
+            body = None
+            if name == 'check-eligibility':
+                sale = rng.choice(sales)
+                datekey = str(sale['datekey'])
+                body = {'name': names[sale['passengerkey']], 'flightId': sale['flightkey'], 'baggage': sale['baggagestatus'], 'date': f'{datekey[:4]}-{datekey[4:6]}-{datekey[6:]}'}
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=60)
+                system_error = name == 'check-eligibility' and response.ok and response.json().get('reason') == 'System error'
+                result = outcome(response.status_code, system_error)
+            except requests.exceptions.RequestException:
+                result = 'error'
+            record(name, started, result)
+
+    def process_jobs():
+        run = 0
+        while time.perf_counter() < stop_at:
+            path = os.path.join(upload_folder, f'loadtest_passengers_{seed_offset}_{run}.csv')
+            write_process_file(path, process_rows)
+            started = time.perf_counter()
+            try:
+                response = requests.post(base_url + '/process', json={'file_path': path}, timeout=3600)
+                result = outcome(response.status_code)
+            except requests.exceptions.RequestException:
+                result = 'error'
+            record('process', started, result)
+            run += 1
+
+    with ThreadPoolExecutor(max_workers=threads + 1) as pool:
+        futures = [pool.submit(client, seed_offset + worker_id) for worker_id in range(threads)]
+        if with_process:
+            futures.append(pool.submit(process_jobs))
+        for future in futures:
+            future.result()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Airline Data Warehouse API against a local Supabase stand-in')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of traffic')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent client threads in total')
+    parser.add_argument('--client-processes', type=int, default=1, help='processes the client threads are spread over')
+    parser.add_argument('--mix', default='home=2,stats=1,check-eligibility=7', help='weighted endpoint mix, e.g. home=2,stats=1')
+    parser.add_argument('--upstream-latency-ms', type=float, default=20, help='mean injected Supabase latency')
+    parser.add_argument('--upstream-error-rate', type=float, default=0.0, help='fraction of Supabase requests failing with 503')
+    parser.add_argument('--with-process', action='store_true', help='run /process jobs back-to-back during the test')
+    parser.add_argument('--process-rows', type=int, default=500, help='rows in each synthetic /process file')
+    parser.add_argument('--output', help='write the JSON report here as well as stdout')
+    parser.add_argument('--serve-fake', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_fake:
+        serve_fake(args)
+        return
+
+    weights = parse_mix(args.mix)
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    # main.py creates its uploads/checkpoints/snapshots folders relative to its working directory
+    workdir = tempfile.mkdtemp(prefix='dw-loadtest-')
+    upload_folder = os.path.join(workdir, 'uploads')
+    os.makedirs(upload_folder)
+    fake_url = f"http://127.0.0.1:{free_port()}"
+    api_url = f"http://127.0.0.1:{free_port()}"
+    processes = []
+    try:
+        fake_process = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), '--serve-fake', '--port', fake_url.rsplit(':', 1)[1],
+            '--upstream-latency-ms', str(args.upstream_latency_ms), '--upstream-error-rate', str(args.upstream_error_rate)
+        ])
+        processes.append(fake_process)
+        wait_until_up(fake_url, fake_process)
+
+        env = dict(os.environ, SUPABASE_URL=fake_url, PYTHONPATH=backend_dir)
+        api_process = subprocess.Popen(
+            [sys.executable, '-m', 'flask', '--app', 'main', 'run', '--host', '127.0.0.1',
+             '--port', api_url.rsplit(':', 1)[1], '--no-reload', '--no-debugger', '--with-threads'],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL
+        )
+        processes.append(api_process)
+        wait_until_up(api_url, api_process)
+        print(f"🧪 API at {api_url}, Supabase stand-in at {fake_url}, workdir {workdir}")
+
+        client_processes = max(1, min(args.client_processes, args.concurrency))
+        started = time.perf_counter()
+        samples = {}
+        with ProcessPoolExecutor(max_workers=client_processes) as pool:
+            futures = [
+                pool.submit(
+                    run_clients, api_url, weights, args.duration,
+                    # Spread threads evenly; only the first process drives /process jobs
+                    args.concurrency // client_processes + (1 if i < args.concurrency % client_processes else 0),
+                    i * 1000, args.with_process and i == 0, args.process_rows, upload_folder
+                )
+                for i in range(client_processes)
+            ]
+            for future in futures:
+                for name, entries in future.result().items():
+                    samples.setdefault(name, []).extend(entries)
+        elapsed = time.perf_counter() - started
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'config': vars(args),
+        'elapsed_seconds': round(elapsed, 2),
+        'endpoints': summarize(samples, elapsed)
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import threading
+from difflib import SequenceMatcher
+import pandas as pd
+from file_utils import FileLock, write_json_atomic
+
+class PassengerDeduplicator:
+    """
+    Entity resolution for passengers on normalized FullName + Email.
+    Only records that share a blocking key are compared, so matching stays near-linear
+    instead of comparing every incoming row against every existing passenger.
+
+    A merge needs the same email. A near-identical name alone is enough only for rows whose
+    PassengerKey was generated or transformed by DataCleaner, i.e. rows with no key of their own.
+    """
+
+    def __init__(self, name_threshold=0.95, email_name_threshold=0.6, max_block_candidates=50):
+        self.name_threshold = name_threshold
+        self.email_name_threshold = email_name_threshold
+        # Caps work on huge blocks (very common surnames) so one block can't go quadratic
+        self.max_block_candidates = max_block_candidates
+        self.records = []
+        self.blocks = {}
+
+    def index_existing(self, existing_passengers):
+        """Load existing dimpassengers rows (lowercase Supabase columns) into the index"""
+        if existing_passengers.empty:
+            return
+        for row in existing_passengers.to_dict('records'):
+            self._add(row.get('passengerkey'), row.get('fullname'), row.get('email'))
+
+    def deduplicate(self, clean_df, synthetic_keys=None):
+        """
+        Drop incoming passengers that resolve to an already indexed passenger.
+        synthetic_keys: PassengerKeys DataCleaner generated or transformed in this batch.
+        Returns (deduplicated_df, merge_decisions); kept rows are indexed for later batches.
+        """
+        if clean_df.empty:
+            return clean_df, []
+
+        synthetic_keys = synthetic_keys or set()
+        keep = []
+        merge_decisions = []
+        for row in clean_df.to_dict('records'):
+            name = self.normalize_name(row.get('FullName'))
+            email = self.normalize_email(row.get('Email'))
+            match, score, reason = self._best_match(name, email, allow_name_only=row['PassengerKey'] in synthetic_keys)
+            if match is not None:
+                merge_decisions.append({
+                    'passenger_key': row['PassengerKey'],
+                    'full_name': row.get('FullName'),
+                    'merged_into': match['key'],
+                    'reason': reason,
+                    'score': round(score, 3),
+                    # Only a key the file itself supplied can be referenced by sales rows later
+                    'key_supplied': row['PassengerKey'] not in synthetic_keys
+                })
+                print(f"🔗 Merged '{row['PassengerKey']}' ({row.get('FullName')}) into '{match['key']}' - {reason}")
+                keep.append(False)
+            else:
+                self._add(row['PassengerKey'], name, email, normalized=True)
+                keep.append(True)
+
+        return clean_df[keep].reset_index(drop=True), merge_decisions
+
+    def normalize_name(self, name):
+        if name is None or pd.isna(name):
+            return ''
+        name = re.sub(r'[^a-z\s]', '', str(name).lower())
+        return ' '.join(name.split())
+
+    def normalize_email(self, email):
+        """Lowercase and drop '+tag' suffixes and dots from the local part"""
+        if email is None or pd.isna(email) or '@' not in str(email):
+            return None
+        local, domain = str(email).strip().lower().rsplit('@', 1)
+        local = local.split('+', 1)[0].replace('.', '')
+        return f"{local}@{domain}"
+
+    def soundex(self, word):
+        codes = {
+            **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'),
+            **dict.fromkeys('dt', '3'), 'l': '4', **dict.fromkeys('mn', '5'), 'r': '6'
+        }
+        if not word:
+            return ''
+        result = word[0].upper()
+        previous = codes.get(word[0], '')
+        for char in word[1:]:
+            code = codes.get(char, '')
+            if code and code != previous:
+                result += code
+                if len(result) == 4:
+                    break
+            if char not in 'hw':
+                previous = code
+        return result.ljust(4, '0')
+
+    def blocking_keys(self, name, email):
+        keys = []
+        if email:
+            keys.append(('email', email))
+        parts = name.split()
+        if parts:
+            # Phonetic block: surname sound + first initial catches spelling variants
+            keys.append(('phonetic', self.soundex(parts[-1]) + parts[0][0]))
+            # Prefix block catches typos late in the name that change the soundex code
+            keys.append(('prefix', name[:4]))
+        return keys
+
+    def _add(self, key, name, email, normalized=False):
+        if not normalized:
+            name = self.normalize_name(name)
+            email = self.normalize_email(email)
+        record_id = len(self.records)
+        self.records.append({'key': key, 'name': name, 'email': email})
+        for block_key in self.blocking_keys(name, email):
+            self.blocks.setdefault(block_key, []).append(record_id)
+
+    def _best_match(self, name, email, allow_name_only=False):
+        candidate_ids = set()
+        for block_key in self.blocking_keys(name, email):
+            candidate_ids.update(self.blocks.get(block_key, [])[-self.max_block_candidates:])
+
+        best, best_score, best_reason = None, 0.0, None
+        for record_id in candidate_ids:
+            candidate = self.records[record_id]
+            score, reason = self._score(name, email, candidate, allow_name_only)
+            if score > best_score:
+                best, best_score, best_reason = candidate, score, reason
+        return best, best_score, best_reason
+
+    def _score(self, name, email, candidate, allow_name_only=False):
+        name_score = SequenceMatcher(None, name, candidate['name']).ratio() if name and candidate['name'] else 0.0
+
+        if email and candidate['email']:
+            # Same mailbox with a plausibly similar name is the same traveller; shared family
+            # addresses with unrelated names are not merged
+            if email == candidate['email'] and name_score >= self.email_name_threshold:
+                return 1.0, f"same email ({email}), name similarity {name_score:.2f}"
+            # Two different known emails: treat as different people even if names match
+            return 0.0, None
+
+        # Without two emails to compare, a distinct supplied key is the better evidence of a distinct person
+        if allow_name_only and name_score >= self.name_threshold:
+            return name_score, f"name similarity {name_score:.2f} with no conflicting email (generated key)"
+        return 0.0, None
+
+class PassengerAliases:
+    """
+    Merged PassengerKey -> surviving PassengerKey, kept in a JSON file shared by all workers.
+    Sales loads resolve keys through it, so sales for a merged passenger still pass FK checks.
+    """
+
+    def __init__(self, alias_folder='aliases'):
+        os.makedirs(alias_folder, exist_ok=True)
+        self.alias_path = os.path.join(alias_folder, 'passenger_aliases.json')
+        self.lock_path = os.path.join(alias_folder, 'passenger_aliases.lock')
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.alias_path):
+            return {}
+        with open(self.alias_path, 'r') as f:
+            return json.load(f)
+
+    def add(self, merge_decisions):
+        """Record aliases for merged rows that carried their own key; returns how many were new"""
+        new_aliases = {
+            str(decision['passenger_key']): str(decision['merged_into'])
+            for decision in merge_decisions
+            if decision.get('key_supplied') and decision['passenger_key'] != decision['merged_into']
+        }
+        if not new_aliases:
+            return 0
+        with FileLock(self.lock_path, self._lock):
+            aliases = self.load()
+            added = {key: target for key, target in new_aliases.items() if key not in aliases}
+            aliases.update(added)
+            # Follow chains so every alias points straight at a surviving key
+            for key, target in aliases.items():
+                seen = {key}
+                while target in aliases and target not in seen:
+                    seen.add(target)
+                    target = aliases[target]
+                aliases[key] = target
+            write_json_atomic(self.alias_path, aliases)
+        return len(added)
+
+    def resolve(self, keys, aliases=None):
+        """Map a Series of PassengerKeys to their surviving keys (others pass through unchanged)"""
+        aliases = self.load() if aliases is None else aliases
+        if not aliases:
+            return keys
+        return keys.map(lambda key: aliases.get(str(key).strip(), key) if not pd.isna(key) else key)
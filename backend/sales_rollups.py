@@ -0,0 +1,238 @@
+import copy
+import json
+import os
+import threading
+from datetime import datetime
+import pandas as pd
+from file_utils import FileLock, write_json_atomic
+
+ROLLUP_DIMENSIONS = ['date', 'month', 'airline', 'route', 'loyalty']
+COUNT_MEASURES = ['transactions', 'insurance_eligible']
+SUM_MEASURES = ['total_amount', 'baggage_fees', 'delay_minutes']
+
+class SalesRollups:
+    """
+    Pre-aggregated factsales measures by date, month, airline, route and loyalty tier.
+
+    Each batch committed by insert_sales is folded into the running totals, so a rollup is
+    never recomputed from factsales. Totals live in a compacted base file plus an append-only
+    log of per-batch deltas shared by all workers: applying a batch appends one line, and
+    workers fold in only the lines appended since their last read. The log is compacted into
+    a new base (with the next generation number) once it grows past compact_bytes.
+    """
+
+    def __init__(self, rollup_folder='rollups', compact_bytes=4 * 1024 * 1024):
+        os.makedirs(rollup_folder, exist_ok=True)
+        self.rollup_folder = rollup_folder
+        self.compact_bytes = compact_bytes
+        self.rollup_path = os.path.join(rollup_folder, 'sales_rollups.json')
+        self.lock_path = os.path.join(rollup_folder, 'sales_rollups.lock')
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._rollups = self._empty()
+        self._base_id = None
+        self._log_offset = 0
+
+    def _empty(self, generation=0):
+        return {'updated_at': None, 'generation': generation, 'dimensions': {dimension: {} for dimension in ROLLUP_DIMENSIONS}}
+
+    def _log_path(self, generation):
+        return os.path.join(self.rollup_folder, f"sales_rollups.{generation}.log")
+
+    def build_lookups(self, existing_flights, existing_passengers):
+        """Map flightkey -> (airline, route) and passengerkey -> loyalty tier from Supabase rows"""
+        flights = {}
+        if not existing_flights.empty:
+            for row in existing_flights.to_dict('records'):
+                route = f"{row.get('originairportkey')}-{row.get('destinationairportkey')}"
+                flights[row.get('flightkey')] = (row.get('airlinekey') or 'Unknown', route)
+        passengers = {}
+        if not existing_passengers.empty:
+            for row in existing_passengers.to_dict('records'):
+                passengers[row.get('passengerkey')] = row.get('loyaltystatus') or 'Bronze'
+        return {'flights': flights, 'passengers': passengers}
+
+    def apply_batch(self, inserted_df, lookups):
+        """Fold newly inserted sales rows (DataCleaner column names) into the shared rollups"""
+        if inserted_df.empty:
+            return
+        entry = {'at': datetime.now().isoformat(), 'deltas': self._aggregate(inserted_df, lookups)}
+        with self._file_lock():
+            self._read_locked()
+            log_path = self._log_path(self._rollups['generation'])
+            with open(log_path, 'ab') as f:
+                # Drop a torn last line left by a crash mid-append before adding ours
+                f.truncate(self._log_offset)
+                f.write((json.dumps(entry) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            self._read_locked()
+            if self._log_offset >= self.compact_bytes:
+                self._compact_locked()
+        print(f"📈 Updated sales rollups with {len(inserted_df)} transactions")
+
+    def apply_upstream_rows(self, rows, lookups):
+        """Fold rows confirmed inserted into factsales (lowercase Supabase columns), e.g. by the spool drainer"""
+        self.apply_batch(self._from_upstream(pd.DataFrame(rows)), lookups)
+
+    def rebuild(self, fetch_sales, lookups):
+        """
+        Backfill from every factsales row. fetch_sales() returns the rows (lowercase Supabase
+        columns) or None; it runs under the rollup lock so no batch lands between the read and
+        the replace. Returns the number of rows, or None if the read failed.
+        """
+        with self._file_lock():
+            rows = fetch_sales()
+            if rows is None:
+                return None
+            renamed = self._from_upstream(pd.DataFrame(rows))
+            self._read_locked()
+            rollups = self._empty(self._rollups['generation'] + 1)
+            if not renamed.empty:
+                rollups['dimensions'] = self._aggregate(renamed, lookups)
+            rollups['updated_at'] = datetime.now().isoformat()
+            self._write_base_locked(rollups)
+        return len(renamed)
+
+    def _from_upstream(self, df):
+        return df.rename(columns={
+            'datekey': 'DateKey', 'passengerkey': 'PassengerKey', 'flightkey': 'FlightKey',
+            'totalamount': 'TotalAmount', 'baggagefees': 'BaggageFees', 'flightdelay': 'FlightDelay',
+            'iseligibleforinsurance': 'IsEligibleForInsurance'
+        })
+
+    def _aggregate(self, df, lookups):
+        df = df.copy()
+        df['DateKey'] = df['DateKey'].astype(int)
+        df['date'] = df['DateKey'].astype(str)
+        df['month'] = (df['DateKey'] // 100).astype(str)
+        flight_info = df['FlightKey'].map(lambda key: lookups['flights'].get(key, ('Unknown', 'Unknown')))
+        df['airline'] = flight_info.map(lambda info: info[0])
+        df['route'] = flight_info.map(lambda info: info[1])
+        df['loyalty'] = df['PassengerKey'].map(lambda key: lookups['passengers'].get(key, 'Unknown'))
+        df['transactions'] = 1
+        df['total_amount'] = df['TotalAmount'].astype(float)
+        df['baggage_fees'] = df['BaggageFees'].astype(float)
+        df['delay_minutes'] = pd.to_numeric(df['FlightDelay'], errors='coerce').fillna(0).astype(float)
+        df['insurance_eligible'] = df['IsEligibleForInsurance'].astype(bool).astype(int)
+
+        deltas = {}
+        for dimension in ROLLUP_DIMENSIONS:
+            grouped = df.groupby(dimension)[COUNT_MEASURES + SUM_MEASURES].sum()
+            deltas[dimension] = {}
+            for key, row in grouped.iterrows():
+                measures = {name: int(row[name]) for name in COUNT_MEASURES}
+                measures.update({name: float(row[name]) for name in SUM_MEASURES})
+                deltas[dimension][str(key)] = measures
+        return deltas
+
+    def get_dimension(self, dimension):
+        self._sync()
+        with self._lock:
+            groups = self._rollups['dimensions'].get(dimension)
+            if groups is None:
+                return None
+            return {key: self._with_averages(measures) for key, measures in groups.items()}
+
+    def get_group(self, dimension, key):
+        self._sync()
+        with self._lock:
+            groups = self._rollups['dimensions'].get(dimension)
+            if groups is None or key not in groups:
+                return None
+            return self._with_averages(groups[key])
+
+    def summary(self):
+        self._sync()
+        with self._lock:
+            return {
+                'updated_at': self._rollups['updated_at'],
+                'groups': {dimension: len(groups) for dimension, groups in self._rollups['dimensions'].items()}
+            }
+
+    def _with_averages(self, measures):
+        result = dict(measures)
+        transactions = measures.get('transactions', 0)
+        result['avg_total_amount'] = round(measures['total_amount'] / transactions, 2) if transactions else 0
+        result['avg_delay_minutes'] = round(measures['delay_minutes'] / transactions, 2) if transactions else 0
+        return result
+
+    def _stat_base(self):
+        try:
+            stat = os.stat(self.rollup_path)
+            return (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _sync(self):
+        # Another worker may have appended or compacted; only take the lock when something changed
+        try:
+            log_size = os.path.getsize(self._log_path(self._rollups['generation']))
+        except OSError:
+            log_size = 0
+        if self._stat_base() == self._base_id and log_size == self._log_offset:
+            return
+        with self._file_lock(shared=True):
+            self._read_locked()
+
+    def _read_locked(self):
+        """Load a new base if one was written, then fold in complete log lines past our offset"""
+        base_id = self._stat_base()
+        with self._lock:
+            if base_id != self._base_id:
+                rollups = self._empty()
+                if base_id is not None:
+                    try:
+                        with open(self.rollup_path, 'r') as f:
+                            rollups = json.load(f)
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️ Could not read sales rollups: {str(e)}")
+                        return
+                self._rollups = rollups
+                self._base_id = base_id
+                self._log_offset = 0
+            try:
+                with open(self._log_path(self._rollups['generation']), 'rb') as f:
+                    f.seek(self._log_offset)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        self._apply_entry(json.loads(line))
+                        self._log_offset += len(line)
+            except FileNotFoundError:
+                pass
+
+    def _apply_entry(self, entry):
+        for dimension, groups in entry['deltas'].items():
+            target = self._rollups['dimensions'][dimension]
+            for key, measures in groups.items():
+                current = target.setdefault(key, {name: 0 for name in measures})
+                for name, value in measures.items():
+                    current[name] = current.get(name, 0) + value
+        self._rollups['updated_at'] = entry['at']
+
+    def _compact_locked(self):
+        with self._lock:
+            rollups = copy.deepcopy(self._rollups)
+        rollups['generation'] += 1
+        self._write_base_locked(rollups)
+        print(f"🗜️ Compacted sales rollups into generation {rollups['generation']}")
+
+    def _write_base_locked(self, rollups):
+        # The new base names the next generation, so the old log stops counting the moment it is
+        # in place; a crash before the old log is removed can never apply those deltas twice
+        write_json_atomic(self.rollup_path, rollups)
+        for name in os.listdir(self.rollup_folder):
+            if name.startswith('sales_rollups.') and name.endswith('.log') and name != os.path.basename(self._log_path(rollups['generation'])):
+                try:
+                    os.remove(os.path.join(self.rollup_folder, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self._rollups = rollups
+            self._base_id = self._stat_base()
+            self._log_offset = 0
+
+    def _file_lock(self, shared=False):
+        # Serializes rollup writes across threads and worker processes; readers take it shared
+        return FileLock(self.lock_path, self._write_lock, shared)
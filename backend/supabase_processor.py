@@ -1,8 +1,50 @@
 import requests
 import pandas as pd
 import json
+import math
+import threading
 from datetime import datetime
 
+DIMENSION_TABLES = ['dimairlines', 'dimairports', 'dimpassengers', 'dimflights', 'dimdate']
+WAREHOUSE_TABLES = DIMENSION_TABLES + ['factsales', 'dirtydata']
+# Natural key of each table (dirtydata has none)
+TABLE_KEYS = {
+    'dimairlines': 'airlinekey',
+    'dimairports': 'airportkey',
+    'dimpassengers': 'passengerkey',
+    'dimflights': 'flightkey',
+    'dimdate': 'datekey',
+    'factsales': 'transactionid'
+}
+
+# Statuses meaning Supabase rejected the rows themselves (bad value, FK or constraint violation, too
+# large); anything else (5xx, 429, auth, connection errors) is about upstream, not the rows
+ROW_REJECTION_STATUSES = {400, 409, 413, 422}
+
+def _json_safe(record):
+    """Missing CSV fields arrive as NaN (not valid JSON) and numeric cells as numpy scalars"""
+    safe = {}
+    for column, value in record.items():
+        if hasattr(value, 'item'):
+            value = value.item()
+        safe[column] = None if isinstance(value, float) and math.isnan(value) else value
+    return safe
+
+def _rejects_rows(error):
+    """True when Supabase (or JSON encoding) refused the rows themselves rather than being unavailable"""
+    if isinstance(error, requests.exceptions.InvalidJSONError):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in ROW_REJECTION_STATUSES
+
+class UpstreamError(Exception):
+    """A Supabase write failed; status is None when no response came back"""
+
+    def __init__(self, message, status=None, rows_rejected=None):
+        super().__init__(message)
+        self.status = status
+        self.rows_rejected = status in ROW_REJECTION_STATUSES if rows_rejected is None else rows_rejected
+
 class SupabaseProcessor:
     def __init__(self, supabase_url, supabase_key):
         self.supabase_url = supabase_url
@@ -13,8 +55,37 @@ class SupabaseProcessor:
             'Content-Type': 'application/json',
             'Prefer': 'return=minimal'
         }
+        # Per-thread count of swallowed API errors (see failed_requests) and rows Supabase rejected
+        self._failures = threading.local()
+        # Optional DimensionSnapshot shared across worker processes; None means always read upstream
+        self.snapshot = None
+        self._snapshot_refresh = threading.Lock()
+        # Optional WriteBehindSpool; when set, insert_* commit rows locally and a drainer sends them upstream
+        self.spool = None
     
-    def _make_request(self, endpoint, method='GET', data=None):
+    @property
+    def failed_requests(self):
+        """
+        Swallowed API errors on the calling thread, so callers can tell whether a batch fully
+        reached Supabase without seeing failures from other requests or the spool drainer
+        """
+        return getattr(self._failures, 'count', 0)
+    
+    def _record_failure(self):
+        self._failures.count = self.failed_requests + 1
+    
+    def take_rejected_rows(self):
+        """
+        Return and forget the rows Supabase rejected on the calling thread since the last call,
+        as (clean_df index, dirty row) pairs. A rejection fails the same way on every retry, so it
+        is not counted in failed_requests; callers report these rows as dirty instead.
+        """
+        rejected = getattr(self._failures, 'rejected', [])
+        self._failures.rejected = []
+        return rejected
+    
+    def _make_request(self, endpoint, method='GET', data=None, source_row=None):
+        """source_row: the clean row a POST writes, recorded as rejected if Supabase refuses it"""
         url = f"{self.supabase_url}/rest/v1/{endpoint}"
         try:
             if method == 'GET':
@@ -25,149 +96,327 @@ class SupabaseProcessor:
             return response
         except requests.exceptions.RequestException as e:
             print(f"Supabase API error: {e}")
+            if source_row is not None and _rejects_rows(e):
+                detail = e.response.text[:500] if getattr(e, 'response', None) is not None else str(e)
+                rejected = getattr(self._failures, 'rejected', [])
+                rejected.append((source_row.name, {'data': source_row.to_dict(), 'error': f'Rejected by Supabase: {detail}'}))
+                self._failures.rejected = rejected
+            else:
+                self._record_failure()
             return None
     
+    def fetch_all(self, endpoint, params=None, order=None, page_size=1000):
+        """Read every matching row using limit/offset pages; returns None if any page fails"""
+        rows = []
+        offset = 0
+        while True:
+            page_params = dict(params or {})
+            page_params.update({'limit': page_size, 'offset': offset})
+            if order:
+                page_params['order'] = order
+            response = self._make_request(endpoint, 'GET', page_params)
+            if not response:
+                return None
+            page = response.json()
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+    
+    def count_rows(self, endpoint, params=None):
+        """Exact row count from PostgREST's Content-Range header without transferring the rows"""
+        url = f"{self.supabase_url}/rest/v1/{endpoint}"
+        headers = dict(self.headers)
+        headers['Prefer'] = 'count=exact'
+        page_params = dict(params or {})
+        page_params['limit'] = 1
+        try:
+            response = requests.get(url, headers=headers, params=page_params)
+            response.raise_for_status()
+            return int(response.headers.get('Content-Range', '*/0').split('/')[-1])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Supabase API error: {e}")
+            self._record_failure()
+            return None
+    
+    def bulk_insert(self, endpoint, rows):
+        """
+        Insert many rows in one request, ignoring rows whose natural key already exists.
+        Returns the rows Supabase actually inserted; raises UpstreamError if the request failed.
+        """
+        url = f"{self.supabase_url}/rest/v1/{endpoint}"
+        headers = dict(self.headers)
+        params = None
+        if TABLE_KEYS.get(endpoint):
+            headers['Prefer'] = 'return=representation,resolution=ignore-duplicates'
+            params = {'on_conflict': TABLE_KEYS[endpoint]}
+        else:
+            headers['Prefer'] = 'return=representation'
+        try:
+            response = requests.post(url, headers=headers, params=params, json=rows)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.HTTPError as e:
+            self._record_failure()
+            raise UpstreamError(f"{e}: {e.response.text[:500]}", e.response.status_code)
+        except requests.exceptions.InvalidJSONError as e:
+            # The rows could not even be encoded (e.g. NaN); never reached Supabase
+            self._record_failure()
+            raise UpstreamError(str(e), rows_rejected=True)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._record_failure()
+            raise UpstreamError(str(e))
+    
+    def _airport_record(self, row):
+        return _json_safe({
+            'airportkey': row['AirportKey'],
+            'airportname': row['AirportName'],
+            'city': row['City'],
+            'country': row['Country'],
+            'region': row.get('Region', 'Unknown')
+        })
+    
+    def _airline_record(self, row):
+        return _json_safe({
+            'airlinekey': row['AirlineKey'],
+            'airlinename': row['AirlineName'],
+            'alliance': row.get('Alliance', 'Unknown')
+        })
+    
+    def _passenger_record(self, row):
+        return _json_safe({
+            'passengerkey': row['PassengerKey'],
+            'fullname': row['FullName'],
+            'email': row.get('Email'),
+            'loyaltystatus': row.get('LoyaltyStatus', 'Bronze')
+        })
+    
+    def _flight_record(self, row):
+        return _json_safe({
+            'flightkey': row['FlightKey'],
+            'originairportkey': row['OriginAirportKey'],
+            'destinationairportkey': row['DestinationAirportKey'],
+            'aircrafttype': row.get('AircraftType', 'Unknown'),
+            'airlinekey': row.get('AirlineKey', 'Unknown')
+        })
+    
+    def _sales_record(self, row):
+        return _json_safe({
+            'transactionid': row['TransactionID'],
+            'datekey': row['DateKey'],
+            'passengerkey': row['PassengerKey'],
+            'flightkey': row['FlightKey'],
+            'ticketprice': float(row['TicketPrice']),
+            'taxes': float(row['Taxes']),
+            'baggagefees': float(row['BaggageFees']),
+            'totalamount': float(row['TotalAmount']),
+            'flightdelay': row.get('FlightDelay', 0),
+            'baggagestatus': row.get('BaggageStatus', 'Delivered'),
+            'iseligibleforinsurance': row['IsEligibleForInsurance']
+        })
+    
+    def _dirty_record(self, dirty_row, source_table):
+        return {
+            'originaldata': _json_safe(dirty_row['data']),
+            'errorreason': dirty_row['error'],
+            'sourcetable': source_table
+        }
+    
     def insert_airports(self, clean_df):
+        if self.spool is not None:
+            self.spool.enqueue('dimairports', [self._airport_record(row) for _, row in clean_df.iterrows()])
+            return
         for _, row in clean_df.iterrows():
             try:
                 check_response = self._make_request('dimairports', 'GET', {'airportkey': f'eq.{row["AirportKey"]}'})
                 existing_data = check_response.json() if check_response else []
                 if not existing_data:
-                    insert_data = {
-                        'airportkey': row['AirportKey'],
-                        'airportname': row['AirportName'],
-                        'city': row['City'],
-                        'country': row['Country'],
-                        'region': row.get('Region', 'Unknown')
-                    }
-                    insert_response = self._make_request('dimairports', 'POST', insert_data)
+                    insert_data = self._airport_record(row)
+                    insert_response = self._make_request('dimairports', 'POST', insert_data, source_row=row)
                     if insert_response:
                         print(f"✅ Inserted airport: {row['AirportKey']} - {row['City']}, {row['Country']}")
             except Exception as e:
                 print(f"❌ Error inserting airport {row['AirportKey']}: {str(e)}")
     
     def insert_airlines(self, clean_df):
+        if self.spool is not None:
+            self.spool.enqueue('dimairlines', [self._airline_record(row) for _, row in clean_df.iterrows()])
+            return
         for _, row in clean_df.iterrows():
             try:
                 check_response = self._make_request('dimairlines', 'GET', {'airlinekey': f'eq.{row["AirlineKey"]}'})
                 existing_data = check_response.json() if check_response else []
                 if not existing_data:
-                    insert_data = {
-                        'airlinekey': row['AirlineKey'],
-                        'airlinename': row['AirlineName'],
-                        'alliance': row.get('Alliance', 'Unknown')
-                    }
-                    self._make_request('dimairlines', 'POST', insert_data)
+                    insert_data = self._airline_record(row)
+                    self._make_request('dimairlines', 'POST', insert_data, source_row=row)
                     print(f"✅ Inserted airline: {row['AirlineKey']} - {row['AirlineName']}")
             except Exception as e:
                 print(f"❌ Error inserting airline {row['AirlineKey']}: {str(e)}")
     
     def insert_passengers(self, clean_df):
+        if self.spool is not None:
+            self.spool.enqueue('dimpassengers', [self._passenger_record(row) for _, row in clean_df.iterrows()])
+            return
         for _, row in clean_df.iterrows():
             try:
                 check_response = self._make_request('dimpassengers', 'GET', {'passengerkey': f'eq.{row["PassengerKey"]}'})
                 existing_data = check_response.json() if check_response else []
                 
                 if not existing_data:
-                    insert_data = {
-                        'passengerkey': row['PassengerKey'],
-                        'fullname': row['FullName'],
-                        'email': row.get('Email'),
-                        'loyaltystatus': row.get('LoyaltyStatus', 'Bronze')
-                    }
+                    insert_data = self._passenger_record(row)
                     
-                    self._make_request('dimpassengers', 'POST', insert_data)
+                    self._make_request('dimpassengers', 'POST', insert_data, source_row=row)
                     print(f"✅ Inserted passenger: {row['PassengerKey']} - {row['FullName']} ({row.get('LoyaltyStatus', 'Bronze')})")
                         
             except Exception as e:
                 print(f"❌ Error inserting passenger {row['PassengerKey']}: {str(e)}")
     
     def insert_flights(self, clean_df):
+        if self.spool is not None:
+            self.spool.enqueue('dimflights', [self._flight_record(row) for _, row in clean_df.iterrows()])
+            return
         for _, row in clean_df.iterrows():
             try:
                 check_response = self._make_request('dimflights', 'GET', {'flightkey': f'eq.{row["FlightKey"]}'})
                 existing_data = check_response.json() if check_response else []
                 if not existing_data:
-                    insert_data = {
-                        'flightkey': row['FlightKey'],
-                        'originairportkey': row['OriginAirportKey'],
-                        'destinationairportkey': row['DestinationAirportKey'],
-                        'aircrafttype': row.get('AircraftType', 'Unknown'),
-                        'airlinekey': row.get('AirlineKey', 'Unknown')
-                    }
-                    self._make_request('dimflights', 'POST', insert_data)
+                    insert_data = self._flight_record(row)
+                    self._make_request('dimflights', 'POST', insert_data, source_row=row)
                     print(f"✅ Inserted flight: {row['FlightKey']}")
             except Exception as e:
                 print(f"❌ Error inserting flight {row['FlightKey']}: {str(e)}")
     
     def insert_sales(self, clean_df):
+        """Insert new sales rows; returns the TransactionIDs actually written by this call"""
+        if self.spool is not None:
+            self.spool.enqueue('factsales', [self._sales_record(row) for _, row in clean_df.iterrows()])
+            return []
+        inserted_ids = []
         for _, row in clean_df.iterrows():
             try:
                 check_response = self._make_request('factsales', 'GET', {'transactionid': f'eq.{row["TransactionID"]}'})
                 existing_data = check_response.json() if check_response else []
                 if not existing_data:
-                    insert_data = {
-                        'transactionid': row['TransactionID'],
-                        'datekey': row['DateKey'],
-                        'passengerkey': row['PassengerKey'],
-                        'flightkey': row['FlightKey'],
-                        'ticketprice': float(row['TicketPrice']),
-                        'taxes': float(row['Taxes']),
-                        'baggagefees': float(row['BaggageFees']),
-                        'totalamount': float(row['TotalAmount']),
-                        'flightdelay': row.get('FlightDelay', 0),
-                        'baggagestatus': row.get('BaggageStatus', 'Delivered'),
-                        'iseligibleforinsurance': row['IsEligibleForInsurance']
-                    }
-                    self._make_request('factsales', 'POST', insert_data)
+                    insert_data = self._sales_record(row)
+                    insert_response = self._make_request('factsales', 'POST', insert_data, source_row=row)
+                    if insert_response:
+                        inserted_ids.append(row['TransactionID'])
                     print(f"✅ Inserted sales transaction: {row['TransactionID']}")
             except Exception as e:
                 print(f"❌ Error inserting sales {row['TransactionID']}: {str(e)}")
+        return inserted_ids
     
-    def insert_dirty_data(self, dirty_rows, source_table):
+    def insert_dirty_data(self, dirty_rows, source_table, row_ids=None):
+        """
+        Write dirty rows in order and stop at the first upstream failure; returns how many were
+        handled (written, or skipped because Supabase rejected them), so they are always a prefix
+        that a retry can skip. row_ids identify the rows in their source (one each) so the spool
+        drops a replayed row without merging identical ones.
+        """
+        if self.spool is not None:
+            self.spool.enqueue('dirtydata', [self._dirty_record(dirty_row, source_table) for dirty_row in dirty_rows], row_ids)
+            return len(dirty_rows)
+        written = 0
         for dirty_row in dirty_rows:
             try:
-                dirty_data = {
-                    'originaldata': dirty_row['data'],
-                    'errorreason': dirty_row['error'],
-                    'sourcetable': source_table
-                }
-                self._make_request('dirtydata', 'POST', dirty_data)
-                print(f"🚨 Inserted dirty data from {source_table}: {dirty_row['error']}")
+                dirty_data = self._dirty_record(dirty_row, source_table)
+                failures_before = self.failed_requests
+                if self._make_request('dirtydata', 'POST', dirty_data, source_row=pd.Series(dirty_row['data'])):
+                    print(f"🚨 Inserted dirty data from {source_table}: {dirty_row['error']}")
+                elif self.failed_requests > failures_before:
+                    break
+                else:
+                    # Rejected rather than unavailable: a retry would fail the same way, so skip it
+                    self.take_rejected_rows()
+                    print(f"⚠️ Supabase rejected dirty data from {source_table}; skipped: {dirty_row['error']}")
+                written += 1
             except Exception as e:
                 print(f"❌ Error inserting dirty data: {str(e)}")
+                break
+        return written
     
-    def get_existing_airports(self):
+    def _get_dimension(self, table, label, columns=None):
+        # Served from the shared memory-mapped snapshot when one has been published; only the
+        # requested columns are decoded
+        if self.snapshot is not None:
+            if self.snapshot.is_stale():
+                self._refresh_stale_snapshot()
+            snapshot_df = self.snapshot.read_table(table, columns)
+            if snapshot_df is not None:
+                return self._with_pending(table, snapshot_df, columns)
         try:
-            response = self._make_request('dimairports')
-            return pd.DataFrame(response.json()) if response else pd.DataFrame()
+            params = {'select': ','.join(columns)} if columns else None
+            rows = self.fetch_all(table, params=params, order=TABLE_KEYS[table])
+            existing_df = pd.DataFrame(rows) if rows else pd.DataFrame()
+            return self._with_pending(table, existing_df, columns)
         except Exception as e:
-            print(f"Error getting airports: {str(e)}")
+            print(f"Error getting {label}: {str(e)}")
             return pd.DataFrame()
     
-    def get_existing_passengers(self):
-        try:
-            response = self._make_request('dimpassengers')
-            return pd.DataFrame(response.json()) if response else pd.DataFrame()
-        except Exception as e:
-            print(f"Error getting passengers: {str(e)}")
-            return pd.DataFrame()
+    def _with_pending(self, table, existing_df, columns=None):
+        # Rows committed to the spool but not yet drained already count as existing for FK checks
+        if self.spool is None:
+            return existing_df
+        pending = self.spool.pending_rows(table)
+        if not pending:
+            return existing_df
+        pending_df = pd.DataFrame(pending)
+        if columns:
+            pending_df = pending_df[[column for column in columns if column in pending_df.columns]]
+        return pd.concat([existing_df, pending_df], ignore_index=True)
     
-    def get_existing_flights(self):
-        try:
-            response = self._make_request('dimflights')
-            return pd.DataFrame(response.json()) if response else pd.DataFrame()
-        except Exception as e:
-            print(f"Error getting flights: {str(e)}")
-            return pd.DataFrame()
+    def get_existing_airports(self, columns=None):
+        return self._get_dimension('dimairports', 'airports', columns)
+    
+    def get_existing_passengers(self, columns=None):
+        return self._get_dimension('dimpassengers', 'passengers', columns)
+    
+    def get_existing_flights(self, columns=None):
+        return self._get_dimension('dimflights', 'flights', columns)
+    
+    def get_existing_dates(self, columns=None):
+        return self._get_dimension('dimdate', 'dates', columns)
+    
+    def get_existing_passenger_keys(self):
+        """
+        Every PassengerKey in Supabase plus spooled ones, read upstream rather than from the
+        snapshot, which can lag a load that stopped part-way. New keys are generated against
+        this set, so a stale one would hand out keys that already exist. Returns None on failure.
+        """
+        rows = self.fetch_all('dimpassengers', params={'select': 'passengerkey'}, order='passengerkey')
+        if rows is None:
+            return None
+        keys = {row['passengerkey'] for row in rows}
+        if self.spool is not None:
+            keys.update(row['passengerkey'] for row in self.spool.pending_rows('dimpassengers'))
+        return keys
     
-    def get_existing_dates(self):
+    def publish_dimension_snapshot(self):
+        """Fetch every dimension table from Supabase and publish it as a new shared snapshot"""
+        if self.snapshot is None:
+            return None
+        failures_before = self.failed_requests
+        tables = {}
+        for table in DIMENSION_TABLES:
+            rows = self.fetch_all(table, order=TABLE_KEYS[table])
+            tables[table] = pd.DataFrame(rows) if rows else pd.DataFrame()
+        # Never replace a good snapshot with one built from a partial upstream read
+        if self.failed_requests > failures_before:
+            print("⚠️ Skipped dimension snapshot publish: upstream read failed")
+            return None
+        return self.snapshot.publish(tables)
+    
+    def _refresh_stale_snapshot(self):
+        # One thread per worker republishes; the others keep reading the old version meanwhile,
+        # as does everyone if upstream is unreachable
+        if not self._snapshot_refresh.acquire(blocking=False):
+            return
         try:
-            response = self._make_request('dimdate')
-            return pd.DataFrame(response.json()) if response else pd.DataFrame()
-        except Exception as e:
-            print(f"Error getting dates: {str(e)}")
-            return pd.DataFrame()
+            if self.snapshot.is_stale():
+                print("⌛ Dimension snapshot expired; republishing from Supabase")
+                self.publish_dimension_snapshot()
+        finally:
+            self._snapshot_refresh.release()
     
     def check_insurance_eligibility(self, passenger_name, flight_id, baggage_status, date):
         try:
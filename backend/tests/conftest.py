@@ -0,0 +1,37 @@
+import importlib
+import os
+import sys
+import pytest
+
+# The backend modules are flat scripts run from backend/, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def fake_supabase():
+    """The load test's in-memory Supabase stand-in, served on a local port"""
+    from load_test import FakeSupabase
+    fake = FakeSupabase()
+    fake.seed(passengers=20, flights=5, days=10)
+    url = fake.start()
+    # Injected failures abort the connection; keep their tracebacks out of the test output
+    fake.server.handle_error = lambda request, client_address: None
+    yield fake, url
+    fake.stop()
+
+@pytest.fixture
+def app_main(tmp_path, monkeypatch, fake_supabase):
+    """main.py writing straight to the stand-in (no spool), with every store under tmp_path"""
+    monkeypatch.setenv('WRITE_BEHIND', '0')
+    monkeypatch.chdir(tmp_path)
+    main = importlib.import_module('main')
+    from checkpoint_store import CheckpointStore
+    from dimension_snapshot import DimensionSnapshot
+    from passenger_dedup import PassengerAliases
+    from sales_rollups import SalesRollups
+    monkeypatch.setattr(main.processor, 'supabase_url', fake_supabase[1])
+    monkeypatch.setattr(main.processor, 'spool', None)
+    monkeypatch.setattr(main.processor, 'snapshot', DimensionSnapshot(str(tmp_path / 'snapshots')))
+    monkeypatch.setattr(main, 'checkpoints', CheckpointStore(str(tmp_path / 'checkpoints')))
+    monkeypatch.setattr(main, 'rollups', SalesRollups(str(tmp_path / 'rollups')))
+    monkeypatch.setattr(main, 'passenger_aliases', PassengerAliases(str(tmp_path / 'aliases')))
+    return main
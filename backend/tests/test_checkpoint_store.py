@@ -0,0 +1,38 @@
+from checkpoint_store import CheckpointStore
+
+def make_store(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'checkpoints'))
+    source = tmp_path / 'passengers.csv'
+    source.write_text('PassengerKey,FullName\nP1001,Ann Lee\n')
+    return store, store.fingerprint(str(source))
+
+def test_staged_chunk_survives_reload_with_dirty_progress(tmp_path):
+    store, fingerprint = make_store(tmp_path)
+    checkpoint = store.start(fingerprint, 'passengers.csv', 2)
+    dirty = [{'data': {'PassengerKey': 'x'}, 'error': 'Missing passenger name'}] * 3
+    store.stage_chunk(checkpoint, 0, clean_rows=5, dirty_rows=dirty, merged_rows=1)
+    store.record_dirty_flushed(checkpoint, 2)
+
+    reloaded = store.load(fingerprint)
+    assert reloaded['last_committed_chunk'] == -1
+    assert reloaded['pending_chunk']['index'] == 0
+    assert reloaded['pending_chunk']['dirty_flushed'] == 2
+    assert reloaded['pending_chunk']['dirty_rows'][2:] == dirty[2:]
+
+def test_commit_chunk_folds_staged_counts(tmp_path):
+    store, fingerprint = make_store(tmp_path)
+    checkpoint = store.start(fingerprint, 'passengers.csv', 2)
+    store.stage_chunk(checkpoint, 0, clean_rows=5, dirty_rows=[{'data': {}, 'error': 'e'}], merged_rows=1)
+    store.record_dirty_flushed(checkpoint, 1)
+    store.commit_chunk(checkpoint)
+
+    reloaded = store.load(fingerprint)
+    assert reloaded['last_committed_chunk'] == 0
+    assert reloaded['pending_chunk'] is None
+    assert (reloaded['clean_rows'], reloaded['dirty_rows_flushed'], reloaded['merged_rows']) == (5, 1, 1)
+
+def test_changed_file_gets_a_new_fingerprint(tmp_path):
+    store, fingerprint = make_store(tmp_path)
+    store.start(fingerprint, 'passengers.csv', 2)
+    (tmp_path / 'passengers.csv').write_text('PassengerKey,FullName\nP1002,Bo Kim\n')
+    assert store.load(store.fingerprint(str(tmp_path / 'passengers.csv'))) is None
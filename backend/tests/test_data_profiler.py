@@ -0,0 +1,54 @@
+import pandas as pd
+from data_cleaning import DataCleaner
+from data_profiler import DataProfiler
+
+def profile_csv(tmp_path, name, text, table_type=None, reference=None):
+    path = tmp_path / name
+    path.write_text(text)
+    # Small chunks so every statistic is merged across chunks
+    return DataProfiler(DataCleaner(), chunk_size=2).profile(str(path), table_type, reference)
+
+def test_passenger_key_classes_follow_the_cleaners_match_order(tmp_path):
+    keys = ['P1001', '', 'P1L1592', 'P1VII-1798', 'P1P1937', 'P2Note: 2758', 'P12', 'ABC123', 'XYZ']
+    report = profile_csv(tmp_path, 'passengers.csv', 'PassengerKey,Email\n' + ''.join(
+        f'"{key}",a{i}@example.com\n' for i, key in enumerate(keys)
+    ))
+
+    assert report['patterns']['PassengerKey'] == {
+        # transform_complex_passenger_key tries PXlettersY first, so it claims 'P1P1937' too;
+        # 'P12' only fits PXPY
+        'missing': 1, 'valid': 1, 'PXlettersY': 2, 'PXletters-Y': 1,
+        'PXPY': 1, 'PXtext:Y': 1, 'other_with_digits': 1, 'no_digits': 1
+    }
+    assert report['patterns']['Email'] == {'missing': 0, 'valid': 9, 'invalid': 0}
+
+def test_null_rates_and_numeric_ranges(tmp_path):
+    report = profile_csv(tmp_path, 'misc.csv', 'Name,Amount\nAnn,10\n,20.5\nBo,abc\nCy,-4\n')
+
+    assert report['rows'] == 4
+    assert report['columns']['Name']['nulls'] == 1
+    assert report['columns']['Name']['null_rate'] == 0.25
+    assert 'numeric' not in report['columns']['Name']
+    assert report['columns']['Amount']['numeric'] == {'min': -4.0, 'max': 20.5, 'mean': 8.8333, 'non_numeric': 1}
+
+def test_fk_misses_normalize_keys_like_the_cleaner(tmp_path):
+    reference = {
+        'passengers': pd.DataFrame({'passengerkey': ['P1001']}),
+        'flights': pd.DataFrame({'FlightKey': ['AA100']}),
+        'dates': pd.DataFrame({'datekey': [20240101]})
+    }
+    report = profile_csv(tmp_path, 'sales.csv', 'PassengerKey,FlightKey,DateKey\n'
+                         ' P1001 ,AA100,20240101\n'
+                         'P1001,AA100,20240101.0\n'
+                         'P9999,ZZ1,2024-01-01\n'
+                         'P1001,AA100,20240101.5\n', 'sales', reference)
+
+    assert report['fk_misses']['PassengerKey'] == {'misses': 1, 'miss_rate': 0.25}
+    assert report['fk_misses']['FlightKey'] == {'misses': 1, 'miss_rate': 0.25}
+    # int(DateKey) in the cleaner: 20240101.0 matches, a date string or a fraction does not
+    assert report['fk_misses']['DateKey'] == {'misses': 2, 'miss_rate': 0.5}
+
+def test_empty_reference_dimension_counts_every_key_as_a_miss(tmp_path):
+    report = profile_csv(tmp_path, 'flights.csv', 'OriginAirportKey,DestinationAirportKey\njfk,LAX\n',
+                         'flight', {'airports': pd.DataFrame()})
+    assert report['fk_misses']['OriginAirportKey']['misses'] == 1
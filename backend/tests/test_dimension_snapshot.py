@@ -0,0 +1,52 @@
+import time
+import pandas as pd
+from dimension_snapshot import DimensionSnapshot
+from supabase_processor import SupabaseProcessor
+
+def test_read_table_decodes_only_requested_columns(tmp_path):
+    snapshot = DimensionSnapshot(str(tmp_path / 'snapshots'))
+    snapshot.publish({
+        'dimpassengers': pd.DataFrame({'passengerkey': ['P1001', 'P1002'], 'fullname': ['Ann Lee', None]}),
+        'dimdate': pd.DataFrame({'datekey': [20240101, 20240102]})
+    })
+
+    keys = snapshot.read_table('dimpassengers', ['passengerkey'])
+    assert list(keys.columns) == ['passengerkey']
+    assert keys['passengerkey'].tolist() == ['P1001', 'P1002']
+    names = snapshot.read_table('dimpassengers')['fullname']
+    assert names.iloc[0] == 'Ann Lee' and pd.isna(names.iloc[1])
+    assert snapshot.column('dimdate', 'datekey').tolist() == [20240101, 20240102]
+
+def test_invalidate_makes_readers_fall_back(tmp_path):
+    snapshot = DimensionSnapshot(str(tmp_path / 'snapshots'))
+    snapshot.publish({'dimdate': pd.DataFrame({'datekey': [20240101]})})
+    assert snapshot.read_table('dimdate') is not None
+
+    snapshot.invalidate()
+    assert snapshot.current_version() is None
+    assert snapshot.read_table('dimdate') is None
+
+    snapshot.publish({'dimdate': pd.DataFrame({'datekey': [20240101, 20240102]})})
+    assert len(snapshot.read_table('dimdate')) == 2
+
+def test_snapshot_goes_stale_after_max_age(tmp_path, monkeypatch):
+    snapshot = DimensionSnapshot(str(tmp_path / 'snapshots'), max_age_seconds=60)
+    assert not snapshot.is_stale()
+    snapshot.publish({'dimdate': pd.DataFrame({'datekey': [20240101]})})
+    assert not snapshot.is_stale()
+
+    published = time.time()
+    monkeypatch.setattr(time, 'time', lambda: published + 61)
+    assert snapshot.is_stale()
+
+def test_processor_republishes_a_stale_snapshot(tmp_path, fake_supabase):
+    fake, url = fake_supabase
+    processor = SupabaseProcessor(url, 'key')
+    processor.snapshot = DimensionSnapshot(str(tmp_path / 'snapshots'), max_age_seconds=3600)
+    processor.publish_dimension_snapshot()
+    # A date added to Supabase by something other than this API
+    fake.insert('dimdate', [{'datekey': 20250101}])
+    assert 20250101 not in processor.get_existing_dates(['datekey'])['datekey'].tolist()
+
+    processor.snapshot.max_age_seconds = 1e-9
+    assert 20250101 in processor.get_existing_dates(['datekey'])['datekey'].tolist()
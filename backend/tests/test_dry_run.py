@@ -0,0 +1,66 @@
+import pytest
+from dry_run import DryRunPreview
+
+def write_rows(tmp_path, count):
+    # Fixed-width rows so the offset estimate is exact
+    path = tmp_path / 'sales.csv'
+    path.write_text('TransactionID,Amount\n' + ''.join(f'{i:06d},100\n' for i in range(1, count + 1)))
+    return str(path)
+
+def test_small_files_get_a_reservoir_over_every_line(tmp_path):
+    path = tmp_path / 'sales.csv'
+    path.write_text('TransactionID,Amount\n' + ''.join(f'{i},100\n' for i in range(1, 21)) + '\n\n')
+    sample, sampling = DryRunPreview(sample_size=5, seed=1).sample(str(path))
+
+    assert sampling['method'] == 'reservoir'
+    assert sampling['estimated_total_rows'] == 20
+    assert sampling['sample_rows'] == 5
+    assert sample['TransactionID'].is_unique
+
+def test_large_files_sample_distinct_lines_at_random_offsets(tmp_path):
+    path = write_rows(tmp_path, 200)
+    sample, sampling = DryRunPreview(sample_size=50, full_scan_bytes=0, seed=3).sample(path)
+
+    assert sampling['method'] == 'random_offsets'
+    assert sampling['estimated_total_rows'] == 200
+    assert sampling['sample_rows'] == 50
+    assert sample['TransactionID'].is_unique
+    assert sample['TransactionID'].is_monotonic_increasing
+
+def test_offset_sampling_reaches_every_row_without_favouring_the_first(tmp_path):
+    path = write_rows(tmp_path, 5)
+    picks = {row: 0 for row in range(1, 6)}
+    for seed in range(200):
+        sample, _ = DryRunPreview(sample_size=2, full_scan_bytes=0, seed=seed).sample(path)
+        assert sample['TransactionID'].is_unique
+        for row in sample['TransactionID']:
+            picks[row] += 1
+    # Equal-length rows are equally likely, the first included (about 80 picks each)
+    assert all(50 <= count <= 110 for count in picks.values()), picks
+
+def test_extrapolate_scales_sample_counts_and_costs():
+    sampling = {'sample_rows': 100, 'estimated_total_rows': 1000}
+    dirty = [{'error': f'Passenger not found: P{i}'} for i in range(6)] + [{'error': f'Flight not found: XX{i}'} for i in range(4)]
+    preview = DryRunPreview().extrapolate(sampling, 90, dirty, clean_seconds=0.1, upstream_rtt=0.01)
+
+    assert (preview['estimated_clean_rows'], preview['estimated_dirty_rows']) == (900, 100)
+    assert preview['reject_rate'] == 0.1
+    assert preview['reject_rate_95ci'] == [0.0412, 0.1588]
+    assert preview['top_error_reasons'] == [
+        {'reason': 'Passenger not found', 'sample_count': 6, 'estimated_rows': 60},
+        {'reason': 'Flight not found', 'sample_count': 4, 'estimated_rows': 40}
+    ]
+    # Direct writes: an existence check + insert per clean row and an insert per dirty row
+    assert preview['estimated_upstream_seconds'] == pytest.approx(19.0)
+    assert preview['estimated_seconds'] == pytest.approx(20.0)
+
+    spooled = DryRunPreview().extrapolate(sampling, 90, dirty, 0.1, 0.01, spool_batch_size=500)
+    assert spooled['estimated_upstream_seconds'] == pytest.approx(0.0, abs=0.05)
+    assert spooled['estimated_seconds'] == pytest.approx(1.0)
+
+def test_reason_class_drops_the_row_specific_part():
+    preview = DryRunPreview()
+    assert preview._reason_class('Invalid PassengerKey: P1x - cannot generate valid key') == 'Invalid PassengerKey'
+    assert preview._reason_class('Invalid AirportKey: AB. Must be 3 uppercase letters') == 'Invalid AirportKey'
+    assert preview._reason_class('Origin airport not found: XXX') == 'Origin airport not found'
+    assert preview._reason_class('Missing passenger name') == 'Missing passenger name'
@@ -0,0 +1,55 @@
+import pandas as pd
+from passenger_dedup import PassengerDeduplicator, PassengerAliases
+
+def make_deduplicator():
+    deduplicator = PassengerDeduplicator()
+    deduplicator.index_existing(pd.DataFrame([
+        {'passengerkey': 'P1001', 'fullname': 'John Smith', 'email': None},
+        {'passengerkey': 'P1002', 'fullname': 'Maria Garcia', 'email': 'maria.garcia@example.com'}
+    ]))
+    return deduplicator
+
+def incoming(*rows):
+    return pd.DataFrame([{'PassengerKey': key, 'FullName': name, 'Email': email} for key, name, email in rows])
+
+def test_supplied_key_is_not_merged_on_name_alone():
+    kept, decisions = make_deduplicator().deduplicate(incoming(
+        ('P2001', 'Joan Smith', None),
+        ('P2002', 'John Smith', 'john@example.com')
+    ))
+    assert decisions == []
+    assert list(kept['PassengerKey']) == ['P2001', 'P2002']
+
+def test_generated_key_merges_on_near_identical_name_only():
+    kept, decisions = make_deduplicator().deduplicate(
+        incoming(('P3001', 'John Smith', None), ('P3002', 'Joan Smith', None)),
+        synthetic_keys={'P3001', 'P3002'}
+    )
+    assert [decision['passenger_key'] for decision in decisions] == ['P3001']
+    assert decisions[0]['merged_into'] == 'P1001'
+    assert not decisions[0]['key_supplied']
+    assert list(kept['PassengerKey']) == ['P3002']
+
+def test_same_email_merges_supplied_key():
+    kept, decisions = make_deduplicator().deduplicate(incoming(('P2003', 'Maria Garcia-Lopez', 'Maria.Garcia+trips@example.com')))
+    assert kept.empty
+    assert decisions[0]['merged_into'] == 'P1002'
+    assert decisions[0]['key_supplied']
+
+def test_different_emails_never_merge():
+    kept, decisions = make_deduplicator().deduplicate(incoming(('P2004', 'Maria Garcia', 'mgarcia@other.com')))
+    assert decisions == []
+    assert len(kept) == 1
+
+def test_aliases_record_supplied_keys_and_resolve_chains(tmp_path):
+    aliases = PassengerAliases(str(tmp_path / 'aliases'))
+    added = aliases.add([
+        {'passenger_key': 'P2003', 'merged_into': 'P1002', 'key_supplied': True},
+        {'passenger_key': 'P3001', 'merged_into': 'P1001', 'key_supplied': False}
+    ])
+    assert added == 1
+    aliases.add([{'passenger_key': 'P4000', 'merged_into': 'P2003', 'key_supplied': True}])
+
+    resolved = aliases.resolve(pd.Series(['P2003', ' P4000 ', 'P3001', None]))
+    assert resolved.tolist()[:3] == ['P1002', 'P1002', 'P3001']
+    assert pd.isna(resolved.iloc[3])
@@ -0,0 +1,80 @@
+import os
+from supabase_processor import DIMENSION_TABLES
+from write_spool import WriteBehindSpool
+
+SALES_HEADER = 'TransactionID,DateKey,PassengerKey,FlightKey,TicketPrice,Taxes,BaggageFees,TotalAmount,FlightDelay,BaggageStatus\n'
+
+def write_sales(tmp_path, fake):
+    flight = fake.tables['dimflights'][0]
+    path = tmp_path / 'sales.csv'
+    path.write_text(SALES_HEADER + ''.join([
+        f"90001,20240101,P1001,{flight['flightkey']},200,20,30,250,0,Delivered\n",
+        f"90002,20240102,P1002,{flight['flightkey']},100,10,0,110,300,Delivered\n",
+        f"90003,20240102,P9999,{flight['flightkey']},100,10,0,110,0,Delivered\n",  # unknown passenger
+    ]))
+    return str(path), flight
+
+def test_sales_load_validates_keys_and_updates_rollups(app_main, fake_supabase, tmp_path):
+    fake, _ = fake_supabase
+    file_path, flight = write_sales(tmp_path, fake)
+
+    response = app_main.app.test_client().post('/process', json={'file_path': file_path})
+    assert response.status_code == 200
+    assert (response.json['clean_rows'], response.json['dirty_rows']) == (2, 1)
+    assert 'Passenger not found: P9999' in fake.tables['dirtydata'][0]['errorreason']
+    # Rollups count only rows this load inserted (the seeded history comes from /analytics/rebuild)
+    month = app_main.rollups.get_group('month', '202401')
+    assert month['transactions'] == 2
+    assert month['total_amount'] == 360.0
+    assert app_main.rollups.get_group('airline', flight['airlinekey'])['transactions'] == 2
+
+def test_spooled_sales_update_rollups_once_drained(app_main, fake_supabase, tmp_path, monkeypatch):
+    fake, _ = fake_supabase
+    file_path, _ = write_sales(tmp_path, fake)
+    spool = WriteBehindSpool(app_main.processor, os.path.join(str(tmp_path), 'spool.db'), hold_delivered=DIMENSION_TABLES)
+    spool.on_delivered = app_main.on_spool_delivered
+    monkeypatch.setattr(app_main.processor, 'spool', spool)
+
+    response = app_main.app.test_client().post('/process', json={'file_path': file_path})
+    assert response.status_code == 200
+    assert app_main.rollups.get_group('month', '202401') is None
+    while spool.drain_once():
+        pass
+    assert app_main.rollups.get_group('month', '202401')['transactions'] == 2
+    assert len(fake.tables['dirtydata']) == 1
+
+def test_flight_load_validates_airports(app_main, fake_supabase, tmp_path):
+    path = tmp_path / 'flights.csv'
+    path.write_text('FlightKey,OriginAirportKey,DestinationAirportKey,AircraftType\nAA900,JFK,LAX,A321\nAA901,JFK,XXX,A321\n')
+
+    response = app_main.app.test_client().post('/process', json={'file_path': str(path)})
+    assert response.status_code == 200
+    assert (response.json['clean_rows'], response.json['dirty_rows']) == (1, 1)
+    assert [row['flightkey'] for row in fake_supabase[0].tables['dimflights'] if row['flightkey'].startswith('AA9')] == ['AA900']
+
+def test_profile_only_reads_and_writes_inside_uploads(app_main, tmp_path):
+    client = app_main.app.test_client()
+    outside = tmp_path / 'outside.csv'
+    outside.write_text('AirportKey\nJFK\n')
+    (tmp_path / 'uploads').mkdir(exist_ok=True)
+    (tmp_path / 'uploads' / 'airports.csv').write_text('AirportKey\nJFK\n')
+
+    for path in [str(outside), 'uploads/../outside.csv', '/etc/hostname']:
+        assert client.post('/profile', json={'file_path': path}).status_code == 400
+    assert not (tmp_path / 'outside.csv.profile.json').exists()
+
+    assert client.post('/profile', json={'file_path': 'uploads/airports.csv'}).status_code == 200
+    assert client.get('/profile', query_string={'file_path': 'uploads/airports.csv'}).json['rows'] == 1
+
+def test_sales_dry_run_validates_keys_and_writes_nothing(app_main, fake_supabase, tmp_path):
+    fake, _ = fake_supabase
+    file_path, _ = write_sales(tmp_path, fake)
+    sales_before = len(fake.tables['factsales'])
+
+    response = app_main.app.test_client().post('/process', json={'file_path': file_path, 'dry_run': True})
+    assert response.status_code == 200
+    assert response.json['dry_run'] is True
+    assert (response.json['estimated_clean_rows'], response.json['estimated_dirty_rows']) == (2, 1)
+    assert response.json['top_error_reasons'][0]['reason'] == 'Passenger not found'
+    assert len(fake.tables['factsales']) == sales_before
+    assert fake.tables['dirtydata'] == []
@@ -0,0 +1,84 @@
+import pytest
+
+PASSENGERS = [
+    ('P5001', 'Ann Lee', 'ann@example.com'),
+    ('P5002', '', 'nobody@example.com'),        # dirty: missing name
+    ('P5003', 'Bo Chan', 'not-an-email'),       # email cleans to None
+    ('P5004', 'Cy Diaz', ''),
+    ('P5005', 'Di Evans', 'di@example.com'),
+    ('P5006', '', 'nobody2@example.com'),       # dirty: missing name
+]
+
+@pytest.fixture
+def passenger_file(tmp_path, app_main):
+    app_main.CHUNK_SIZE = 2
+    path = tmp_path / 'passengers.csv'
+    path.write_text('PassengerKey,FullName,Email,LoyaltyStatus\n' + ''.join(
+        f'{key},{name},{email},Gold\n' for key, name, email in PASSENGERS
+    ))
+    return str(path)
+
+def fail_once(fake, monkeypatch, table, key_column, key, error):
+    """Make the stand-in fail the first insert of one row into table"""
+    insert = fake.insert
+    attempts = []
+
+    def flaky_insert(target, rows, on_conflict=None):
+        if target == table and any(str(row.get(key_column)) == key for row in rows):
+            attempts.append(key)
+            if len(attempts) == 1:
+                raise error
+        return insert(target, rows, on_conflict)
+
+    monkeypatch.setattr(fake, 'insert', flaky_insert)
+    return attempts
+
+def inserted(fake, table, column):
+    return [row[column] for row in fake.tables[table] if str(row.get(column, '')).startswith('P5')]
+
+def test_failed_job_resumes_at_first_uncommitted_chunk(app_main, fake_supabase, passenger_file, monkeypatch):
+    fake, _ = fake_supabase
+    client = app_main.app.test_client()
+    fail_once(fake, monkeypatch, 'dimpassengers', 'passengerkey', 'P5005', ConnectionResetError())
+
+    first = client.post('/process', json={'file_path': passenger_file})
+    assert first.status_code == 503
+    assert first.json['resume_from_chunk'] == 2
+    assert len(fake.tables['dirtydata']) == 1
+
+    # Committed chunks are not cleaned or written again on the retry
+    cleaned = []
+    clean_chunk = app_main.clean_chunk
+    monkeypatch.setattr(app_main, 'clean_chunk', lambda table_type, df, reference: cleaned.append(list(df['PassengerKey'])) or clean_chunk(table_type, df, reference))
+    second = client.post('/process', json={'file_path': passenger_file})
+    assert second.status_code == 200
+    assert second.json['resumed_from_chunk'] == 2
+    assert cleaned == [['P5005', 'P5006']]
+    assert (second.json['clean_rows'], second.json['dirty_rows']) == (4, 2)
+    assert sorted(inserted(fake, 'dimpassengers', 'passengerkey')) == ['P5001', 'P5003', 'P5004', 'P5005']
+    assert len(fake.tables['dirtydata']) == 2
+
+def test_dirty_rows_are_not_written_twice_after_a_failed_flush(app_main, fake_supabase, passenger_file, monkeypatch):
+    fake, _ = fake_supabase
+    client = app_main.app.test_client()
+    fail_once(fake, monkeypatch, 'dirtydata', 'errorreason', 'Missing passenger name', ConnectionResetError())
+
+    assert client.post('/process', json={'file_path': passenger_file}).status_code == 503
+    assert fake.tables['dirtydata'] == []
+    response = client.post('/process', json={'file_path': passenger_file})
+    assert response.status_code == 200
+    assert response.json['resumed_from_chunk'] == 0
+    assert [row['originaldata']['PassengerKey'] for row in fake.tables['dirtydata']] == ['P5002', 'P5006']
+
+def test_rows_supabase_rejects_become_dirty_instead_of_failing_the_chunk(app_main, fake_supabase, passenger_file, monkeypatch):
+    fake, _ = fake_supabase
+    attempts = fail_once(fake, monkeypatch, 'dimpassengers', 'passengerkey', 'P5004', ValueError('violates check constraint'))
+
+    response = app_main.app.test_client().post('/process', json={'file_path': passenger_file})
+    assert response.status_code == 200
+    assert (response.json['clean_rows'], response.json['dirty_rows']) == (3, 3)
+    assert attempts == ['P5004']
+    assert sorted(inserted(fake, 'dimpassengers', 'passengerkey')) == ['P5001', 'P5003', 'P5005']
+    rejected = [row for row in fake.tables['dirtydata'] if row['originaldata']['PassengerKey'] == 'P5004']
+    assert len(rejected) == 1
+    assert 'violates check constraint' in rejected[0]['errorreason']
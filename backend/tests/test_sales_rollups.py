@@ -0,0 +1,54 @@
+import os
+import pandas as pd
+from sales_rollups import SalesRollups
+
+LOOKUPS = {'flights': {'AA100': ('AA', 'JFK-LAX')}, 'passengers': {'P1001': 'Gold'}}
+
+def sales(*rows):
+    return pd.DataFrame([
+        {'TransactionID': tid, 'DateKey': date_key, 'PassengerKey': 'P1001', 'FlightKey': 'AA100',
+         'TotalAmount': amount, 'BaggageFees': 10.0, 'FlightDelay': 0, 'IsEligibleForInsurance': False}
+        for tid, date_key, amount in rows
+    ])
+
+def test_batches_accumulate_and_other_workers_see_them(tmp_path):
+    writer = SalesRollups(str(tmp_path))
+    reader = SalesRollups(str(tmp_path))
+    writer.apply_batch(sales((1, 20240101, 100.0)), LOOKUPS)
+    writer.apply_batch(sales((2, 20240102, 50.0)), LOOKUPS)
+
+    month = reader.get_group('month', '202401')
+    assert month['transactions'] == 2
+    assert month['total_amount'] == 150.0
+    assert reader.get_group('airline', 'AA')['avg_total_amount'] == 75.0
+
+def test_compaction_keeps_totals_and_drops_old_log(tmp_path):
+    rollups = SalesRollups(str(tmp_path), compact_bytes=1)
+    rollups.apply_batch(sales((1, 20240101, 100.0)), LOOKUPS)
+    rollups.apply_batch(sales((2, 20240101, 100.0)), LOOKUPS)
+
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.log')] == []
+    fresh = SalesRollups(str(tmp_path))
+    assert fresh.get_group('date', '20240101')['transactions'] == 2
+
+def test_torn_log_line_is_ignored_and_overwritten(tmp_path):
+    rollups = SalesRollups(str(tmp_path))
+    rollups.apply_batch(sales((1, 20240101, 100.0)), LOOKUPS)
+    with open(os.path.join(str(tmp_path), 'sales_rollups.0.log'), 'ab') as f:
+        f.write(b'{"at": "2024-01-01", "del')
+
+    other = SalesRollups(str(tmp_path))
+    other.apply_batch(sales((2, 20240101, 1.0)), LOOKUPS)
+    assert SalesRollups(str(tmp_path)).get_group('date', '20240101')['total_amount'] == 101.0
+
+def test_rebuild_replaces_incremental_totals(tmp_path):
+    rollups = SalesRollups(str(tmp_path))
+    rollups.apply_batch(sales((1, 20240101, 100.0)), LOOKUPS)
+    upstream = [{'transactionid': 7, 'datekey': 20240201, 'passengerkey': 'P1001', 'flightkey': 'AA100',
+                 'totalamount': 30.0, 'baggagefees': 0.0, 'flightdelay': 300, 'iseligibleforinsurance': True}]
+
+    assert rollups.rebuild(lambda: upstream, LOOKUPS) == 1
+    reader = SalesRollups(str(tmp_path))
+    assert reader.get_group('date', '20240101') is None
+    assert reader.get_group('month', '202402')['insurance_eligible'] == 1
+    assert rollups.rebuild(lambda: None, LOOKUPS) is None
@@ -0,0 +1,59 @@
+import hashlib
+import os
+import threading
+import time
+import pytest
+from upload_sessions import UploadSessionStore, UploadError
+
+def upload(store, payload, chunk_size=4):
+    session = store.create('sales.csv', len(payload), chunk_size)
+    for index in range(session['total_chunks']):
+        chunk = payload[index * chunk_size:(index + 1) * chunk_size]
+        store.put_chunk(session['session_id'], index, chunk, hashlib.sha256(chunk).hexdigest())
+    return session['session_id']
+
+def test_finalize_is_idempotent(tmp_path):
+    store = UploadSessionStore(str(tmp_path))
+    session_id = upload(store, b'a,b\n1,2\n')
+
+    first = store.finalize(session_id)
+    assert store.finalize(session_id) == first
+    assert store.status(session_id)['file_path'] == first
+    with open(first, 'rb') as f:
+        assert f.read() == b'a,b\n1,2\n'
+    with pytest.raises(UploadError):
+        store.put_chunk(session_id, 0, b'a,b\n', hashlib.sha256(b'a,b\n').hexdigest())
+
+def test_concurrent_finalize_returns_the_same_path(tmp_path):
+    store = UploadSessionStore(str(tmp_path))
+    session_id = upload(store, b'x' * 64)
+    results, errors = [], []
+
+    def finalize():
+        try:
+            results.append(store.finalize(session_id))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=finalize) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(set(results)) == 1 and len(results) == 8
+
+def test_size_limit_and_expiry(tmp_path):
+    store = UploadSessionStore(str(tmp_path), max_upload_size=100, ttl_seconds=60)
+    with pytest.raises(UploadError):
+        store.create('big.csv', 101)
+
+    session = store.create('idle.csv', 50)
+    part_path = os.path.join(store.session_folder, f"{session['session_id']}.part")
+    stale = time.time() - 120
+    os.utime(store._meta_path(session['session_id']), (stale, stale))
+
+    assert store.remove_expired() == 1
+    assert not os.path.exists(part_path)
+    with pytest.raises(UploadError):
+        store.status(session['session_id'])
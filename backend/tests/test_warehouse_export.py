@@ -0,0 +1,73 @@
+import os
+import re
+import pandas as pd
+from warehouse_export import WarehouseExporter
+
+class FakeProcessor:
+    """fetch_all/count_rows over in-memory tables, honouring the exporter's datekey month filter"""
+
+    def __init__(self):
+        self.tables = {table: [] for table in ['dimairlines', 'dimairports', 'dimpassengers', 'dimflights']}
+        self.tables['dimairlines'] = [{'airlinekey': 'AA', 'airlinename': 'American'}]
+        self.tables['dimdate'] = [{'datekey': 20240101}, {'datekey': 20240102}]
+        self.tables['factsales'] = [{'transactionid': 1, 'datekey': 20240101}, {'transactionid': 2, 'datekey': 20240102}]
+
+    def fetch_all(self, table, params=None, order=None):
+        rows = self.tables[table]
+        if params and 'and' in params:
+            low, high = map(int, re.findall(r'\d{8}', params['and']))
+            rows = [row for row in rows if low <= row['datekey'] < high]
+        return list(rows)
+
+    def count_rows(self, table, params=None):
+        return len(self.fetch_all(table, params))
+
+def make_exporter(tmp_path, monkeypatch):
+    exporter = WarehouseExporter(FakeProcessor(), str(tmp_path / 'exports'))
+    written = []
+
+    def write_parquet(df, relative_path):
+        # Stands in for pyarrow, which the partition logic doesn't depend on
+        path = os.path.join(exporter.export_folder, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_json(path)
+        written.append((relative_path, len(df)))
+
+    monkeypatch.setattr(exporter, '_check_parquet_engine', lambda: None)
+    monkeypatch.setattr(exporter, '_write_parquet', write_parquet)
+    return exporter, written
+
+def test_unchanged_tables_and_months_are_skipped(tmp_path, monkeypatch):
+    exporter, written = make_exporter(tmp_path, monkeypatch)
+    first = exporter.export()
+    assert 'factsales/month=202401' in first['written']
+    assert 'dimairlines' in first['written']
+
+    written.clear()
+    second = exporter.export()
+    assert second['written'] == [] and written == []
+    assert 'factsales/month=202401' in second['skipped']
+    assert 'dimairlines' in second['skipped']
+
+def test_grown_month_is_rewritten_alone(tmp_path, monkeypatch):
+    exporter, written = make_exporter(tmp_path, monkeypatch)
+    exporter.export()
+    exporter.processor.tables['factsales'].append({'transactionid': 3, 'datekey': 20240102})
+
+    written.clear()
+    summary = exporter.export()
+    assert summary['written'] == ['factsales/month=202401']
+    assert written == [(os.path.join('factsales', 'month=202401', 'part.parquet'), 3)]
+    assert exporter.load_manifest()['factsales_partitions']['202401']['rows'] == 3
+
+def test_new_month_adds_a_partition(tmp_path, monkeypatch):
+    exporter, written = make_exporter(tmp_path, monkeypatch)
+    exporter.export()
+    exporter.processor.tables['dimdate'].append({'datekey': 20240201})
+    exporter.processor.tables['factsales'].append({'transactionid': 3, 'datekey': 20240201})
+
+    summary = exporter.export()
+    assert 'factsales/month=202402' in summary['written']
+    assert 'factsales/month=202401' in summary['skipped']
+    assert sorted(exporter.load_manifest()['factsales_partitions']) == ['202401', '202402']
+    assert pd.read_json(os.path.join(exporter.export_folder, 'factsales', 'month=202402', 'part.parquet'))['transactionid'].tolist() == [3]
@@ -0,0 +1,117 @@
+import os
+import time
+from supabase_processor import UpstreamError
+from write_spool import WriteBehindSpool
+
+class FakeProcessor:
+    """Records bulk_insert calls; reject(row) -> status code fails the whole request like PostgREST"""
+
+    def __init__(self, reject=None):
+        self.reject = reject
+        self.calls = []
+
+    def bulk_insert(self, table, rows):
+        self.calls.append((table, [dict(row) for row in rows]))
+        if self.reject:
+            for row in rows:
+                status = self.reject(table, row)
+                if status:
+                    raise UpstreamError(f'HTTP {status}', status)
+        return rows
+
+def spool_for(tmp_path, processor, **kwargs):
+    return WriteBehindSpool(processor, os.path.join(str(tmp_path), 'spool.db'), **kwargs)
+
+def status_of(spool, table):
+    return dict(spool._connection().execute(
+        'SELECT dedup_key, status FROM spool WHERE table_name = ?', (table,)
+    ).fetchall())
+
+def test_sales_wait_for_dimension_rows_backing_off_or_leased_elsewhere(tmp_path):
+    processor = FakeProcessor()
+    spool = spool_for(tmp_path, processor)
+    other_worker = spool_for(tmp_path, processor)
+    spool.enqueue('dimpassengers', [{'passengerkey': 'P1'}])
+    spool.enqueue('factsales', [{'transactionid': 1, 'passengerkey': 'P1'}])
+    spool.enqueue('dirtydata', [{'errordescription': 'bad row'}])
+
+    spool._write("UPDATE spool SET next_attempt_at = ? WHERE table_name = 'dimpassengers'", (time.time() + 60,))
+    assert spool._claim_batch()[0] == 'dirtydata'
+    assert spool._claim_batch() is None
+
+    spool._write("UPDATE spool SET next_attempt_at = 0 WHERE table_name = 'dimpassengers'")
+    assert other_worker._claim_batch()[0] == 'dimpassengers'
+    assert spool._claim_batch() is None
+
+def test_outage_never_dead_letters(tmp_path):
+    processor = FakeProcessor(reject=lambda table, row: 503)
+    spool = spool_for(tmp_path, processor, max_attempts=1)
+    spool.enqueue('dimairlines', [{'airlinekey': 'AA'}, {'airlinekey': 'BA'}])
+
+    for _ in range(3):
+        assert spool.drain_once() == 0
+    assert status_of(spool, 'dimairlines') == {'AA': 'pending', 'BA': 'pending'}
+    assert spool.outage_backoff > 0
+    assert len(processor.calls) == 3
+
+    processor.reject = None
+    assert spool.drain_once() == 2
+    assert spool.outage_backoff == 0
+
+def test_rejected_batch_is_bisected_down_to_the_bad_row(tmp_path):
+    processor = FakeProcessor(reject=lambda table, row: 409 if row['airlinekey'] == 'XX' else None)
+    spool = spool_for(tmp_path, processor, max_attempts=2)
+    spool.enqueue('dimairlines', [{'airlinekey': key} for key in ['AA', 'BA', 'XX', 'DL', 'UA']])
+
+    assert spool.drain_once() == 4
+    assert status_of(spool, 'dimairlines') == {'XX': 'pending'}
+
+    spool._write("UPDATE spool SET next_attempt_at = 0")
+    assert spool.drain_once() == 0
+    assert status_of(spool, 'dimairlines') == {'XX': 'dead'}
+    assert spool.stats()['dead_letter'] == 1
+
+def test_dead_rows_come_back_on_requeue_or_reenqueue(tmp_path):
+    processor = FakeProcessor(reject=lambda table, row: 422)
+    spool = spool_for(tmp_path, processor, max_attempts=1)
+    spool.enqueue('dimairlines', [{'airlinekey': 'AA', 'airlinename': 'old'}, {'airlinekey': 'BA'}])
+    spool.drain_once()
+    assert set(status_of(spool, 'dimairlines').values()) == {'dead'}
+
+    assert spool.enqueue('dimairlines', [{'airlinekey': 'AA', 'airlinename': 'new'}]) == 1
+    assert status_of(spool, 'dimairlines') == {'AA': 'pending', 'BA': 'dead'}
+    assert spool.pending_rows('dimairlines') == [{'airlinekey': 'AA', 'airlinename': 'new'}]
+    # A key that is already queued is not touched
+    assert spool.enqueue('dimairlines', [{'airlinekey': 'AA', 'airlinename': 'newer'}]) == 0
+
+    assert spool.requeue_dead('dimairlines') == 1
+    processor.reject = None
+    assert spool.drain_once() == 2
+
+def test_delivered_dimension_rows_are_held_until_purged(tmp_path):
+    delivered = []
+    spool = spool_for(tmp_path, FakeProcessor(), hold_delivered=['dimairlines'])
+    spool.on_delivered = lambda table, rows: delivered.append(table)
+    spool.enqueue('dimairlines', [{'airlinekey': 'AA'}])
+    spool.enqueue('dirtydata', [{'errordescription': 'bad row'}])
+
+    assert spool.drain_once() == 1
+    assert spool.drain_once() == 1
+    assert delivered == ['dimairlines', 'dirtydata']
+    assert spool.depth() == 0
+    assert spool.pending_rows('dimairlines') == [{'airlinekey': 'AA'}]
+    assert spool.pending_rows('dirtydata') == []
+
+    spool.purge_delivered(spool.delivered_watermark())
+    assert spool.pending_rows('dimairlines') == []
+    assert spool.delivered_watermark() == 0
+
+def test_identical_dirty_rows_are_kept_apart_unless_their_ids_match(tmp_path):
+    spool = spool_for(tmp_path, FakeProcessor())
+    dirty = {'originaldata': {'PassengerKey': None}, 'errorreason': 'Missing passenger name', 'sourcetable': 'passengers.csv'}
+
+    assert spool.enqueue('dirtydata', [dirty, dirty]) == 2
+    assert spool.enqueue('dirtydata', [dirty, dirty], ['file:0:0', 'file:0:1']) == 2
+    # A replayed flush of the same source rows is dropped
+    assert spool.enqueue('dirtydata', [dirty], ['file:0:1']) == 0
+    assert spool.depth() == 4
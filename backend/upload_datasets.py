@@ -1,4 +1,4 @@
-from supabase_processor import SupabaseProcessor
+from supabase_processor import SupabaseProcessor, WAREHOUSE_TABLES
 
 # Use your actual credentials
 SUPABASE_URL = "https://xnraltsvlgxvddumkmuc.supabase.co"
@@ -10,17 +10,7 @@ print("🧪 Testing Supabase connection with lowercase table names...")
 print("=" * 60)
 
 # Test each table
-tables = [
-    'dimairlines', 
-    'dimairports', 
-    'dimpassengers', 
-    'dimflights', 
-    'dimdate', 
-    'factsales', 
-    'dirtydata'
-]
-
-for table in tables:
+for table in WAREHOUSE_TABLES:
     print(f"Testing {table}...", end=" ")
     response = processor._make_request(table)
     if response and response.status_code == 200:
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from datetime import datetime
+from werkzeug.utils import secure_filename
+from file_utils import write_json_atomic
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_UPLOAD_SIZE = 16 * 1024 * 1024 * 1024
+# Sessions with no chunk activity for this long are removed along with their preallocated file
+SESSION_TTL_SECONDS = 24 * 60 * 60
+# A finalize lock older than this belongs to a worker that died mid-finalize
+FINALIZE_LOCK_SECONDS = 60
+
+class UploadError(Exception):
+    """Client-side problem with an upload session (bad id, bad chunk, incomplete upload)"""
+
+class UploadSessionStore:
+    """
+    Chunked, resumable uploads assembled in place.
+
+    A session preallocates its target file; each chunk is checksum-verified and written at its
+    own offset, so chunks can arrive in any order and in parallel (from any worker) and the
+    finished file is just renamed into uploads/ without being read again. Received chunks are
+    recorded as one marker file each, which keeps parallel chunk writes free of shared state.
+    Abandoned sessions expire after ttl_seconds without a chunk; finalize is idempotent.
+    """
+
+    def __init__(self, upload_folder='uploads', max_upload_size=MAX_UPLOAD_SIZE, ttl_seconds=SESSION_TTL_SECONDS):
+        self.upload_folder = upload_folder
+        self.max_upload_size = max_upload_size
+        self.ttl_seconds = ttl_seconds
+        self.session_folder = os.path.join(upload_folder, '.sessions')
+        os.makedirs(self.session_folder, exist_ok=True)
+
+    def create(self, filename, total_size, chunk_size=DEFAULT_CHUNK_SIZE):
+        safe_name = secure_filename(filename or '')
+        if not safe_name:
+            raise UploadError('Invalid filename')
+        if total_size < 0:
+            raise UploadError('Invalid file size')
+        if total_size > self.max_upload_size:
+            raise UploadError(f'File is larger than the {self.max_upload_size} byte upload limit')
+        if chunk_size <= 0 or chunk_size > MAX_CHUNK_SIZE:
+            raise UploadError(f'chunk_size must be between 1 and {MAX_CHUNK_SIZE} bytes')
+
+        self.remove_expired()
+        if shutil.disk_usage(self.session_folder).free < total_size:
+            raise UploadError('Not enough disk space for this upload')
+
+        session_id = uuid.uuid4().hex
+        total_chunks = max(1, -(-total_size // chunk_size))
+        session = {
+            'session_id': session_id,
+            'filename': safe_name,
+            'total_size': total_size,
+            'chunk_size': chunk_size,
+            'total_chunks': total_chunks,
+            'created_at': datetime.now().isoformat()
+        }
+        os.makedirs(self._chunk_dir(session_id))
+        with open(self._part_path(session_id), 'wb') as f:
+            f.truncate(total_size)
+        self._write_meta(session)
+        print(f"📥 Upload session {session_id} for {safe_name} ({total_chunks} chunks)")
+        return session
+
+    def load(self, session_id):
+        if not re.match(r'^[0-9a-f]{32}$', session_id or ''):
+            raise UploadError('Invalid upload session id')
+        try:
+            with open(self._meta_path(session_id), 'r') as f:
+                return json.load(f)
+        except OSError:
+            raise UploadError(f'Upload session not found: {session_id}')
+
+    def put_chunk(self, session_id, index, data, checksum):
+        session = self.load(session_id)
+        if session.get('file_path'):
+            raise UploadError(f'Upload session {session_id} is already finalized')
+        if index < 0 or index >= session['total_chunks']:
+            raise UploadError(f"Chunk index {index} out of range (0-{session['total_chunks'] - 1})")
+
+        offset = index * session['chunk_size']
+        expected_length = min(session['chunk_size'], session['total_size'] - offset)
+        if len(data) != expected_length:
+            raise UploadError(f'Chunk {index} has {len(data)} bytes, expected {expected_length}')
+        actual = hashlib.sha256(data).hexdigest()
+        if not checksum or actual != checksum.lower():
+            raise UploadError(f'Checksum mismatch for chunk {index}')
+
+        fd = os.open(self._part_path(session_id), os.O_WRONLY)
+        try:
+            if hasattr(os, 'pwrite'):
+                os.pwrite(fd, data, offset)
+            else:
+                os.lseek(fd, offset, os.SEEK_SET)
+                os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # The marker is written only after the data is durable, so a crash never marks a lost chunk
+        with open(os.path.join(self._chunk_dir(session_id), str(index)), 'w') as f:
+            f.write(actual)
+        # The metadata file's mtime is the session's last activity for expiry
+        os.utime(self._meta_path(session_id))
+        return self.status(session_id)
+
+    def status(self, session_id):
+        session = self.load(session_id)
+        if session.get('file_path'):
+            return {
+                'session_id': session_id,
+                'filename': session['filename'],
+                'total_chunks': session['total_chunks'],
+                'chunk_size': session['chunk_size'],
+                'received_chunks': session['total_chunks'],
+                'missing_chunks': [],
+                'file_path': session['file_path']
+            }
+        received = set()
+        for name in os.listdir(self._chunk_dir(session_id)):
+            if name.isdigit():
+                received.add(int(name))
+        missing = [index for index in range(session['total_chunks']) if index not in received]
+        return {
+            'session_id': session_id,
+            'filename': session['filename'],
+            'total_chunks': session['total_chunks'],
+            'chunk_size': session['chunk_size'],
+            'received_chunks': len(received),
+            'missing_chunks': missing
+        }
+
+    def finalize(self, session_id):
+        """
+        Move the assembled file into uploads/ and return its path. Safe to call more than once
+        and concurrently: one caller does the rename under an O_EXCL lock file, the others wait
+        for it and get the same path.
+        """
+        deadline = time.time() + FINALIZE_LOCK_SECONDS
+        while True:
+            session = self.load(session_id)
+            if session.get('file_path'):
+                return session['file_path']
+            if self._acquire_finalize_lock(session_id):
+                break
+            if time.time() > deadline:
+                raise UploadError(f'Upload session {session_id} is already being finalized')
+            time.sleep(0.1)
+
+        try:
+            # Re-read under the lock: another caller may have finished between our check and the lock
+            session = self.load(session_id)
+            if session.get('file_path'):
+                return session['file_path']
+            status = self.status(session_id)
+            if status['missing_chunks']:
+                raise UploadError(f"Upload incomplete: {len(status['missing_chunks'])} chunks missing")
+
+            file_path = os.path.join(self.upload_folder, status['filename'])
+            # Chunks were written in place, so assembly is a rename. A missing part file with the
+            # target in place means an earlier finalize renamed it and died before recording that
+            if os.path.exists(self._part_path(session_id)) or not os.path.exists(file_path):
+                os.replace(self._part_path(session_id), file_path)
+            # The session record stays (until it expires) so a repeated finalize returns this path
+            session['file_path'] = file_path
+            session['finalized_at'] = datetime.now().isoformat()
+            self._write_meta(session)
+            shutil.rmtree(self._chunk_dir(session_id), ignore_errors=True)
+            print(f"✅ Assembled upload {session_id} → {file_path}")
+            return file_path
+        finally:
+            os.remove(self._lock_path(session_id))
+
+    def remove_expired(self):
+        """Delete sessions (and their preallocated files) idle for longer than ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.session_folder):
+            if not name.endswith('.json'):
+                continue
+            session_id = name[:-len('.json')]
+            try:
+                if os.path.getmtime(self._meta_path(session_id)) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            for path in [self._part_path(session_id), self._lock_path(session_id), self._meta_path(session_id)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            shutil.rmtree(self._chunk_dir(session_id), ignore_errors=True)
+            removed += 1
+        if removed:
+            print(f"🧹 Removed {removed} expired upload sessions")
+        return removed
+
+    def _acquire_finalize_lock(self, session_id):
+        lock_path = self._lock_path(session_id)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > FINALIZE_LOCK_SECONDS:
+                    # Left behind by a worker that died mid-finalize
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return False
+        os.close(fd)
+        return True
+
+    def _write_meta(self, session):
+        write_json_atomic(self._meta_path(session['session_id']), session)
+
+    def _meta_path(self, session_id):
+        return os.path.join(self.session_folder, f"{session_id}.json")
+
+    def _part_path(self, session_id):
+        return os.path.join(self.session_folder, f"{session_id}.part")
+
+    def _lock_path(self, session_id):
+        return os.path.join(self.session_folder, f"{session_id}.finalize")
+
+    def _chunk_dir(self, session_id):
+        return os.path.join(self.session_folder, f"{session_id}.chunks")
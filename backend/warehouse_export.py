@@ -0,0 +1,117 @@
+import hashlib
+import importlib.util
+import json
+import os
+from datetime import datetime
+import pandas as pd
+from file_utils import atomic_write, write_json_atomic
+from supabase_processor import DIMENSION_TABLES, TABLE_KEYS
+
+class WarehouseExporter:
+    """
+    Incremental export of the warehouse to compressed Parquet on local disk.
+
+    Dimension tables are written whole and skipped when their content hash is unchanged.
+    factsales is partitioned by DateKey month (factsales/month=YYYYMM/part.parquet); factsales
+    is insert-only, so a month whose upstream row count matches the manifest is left alone and
+    only new or grown months are fetched and rewritten.
+    """
+
+    def __init__(self, processor, export_folder='exports', compression='snappy'):
+        self.processor = processor
+        self.export_folder = export_folder
+        self.compression = compression
+        self.manifest_path = os.path.join(export_folder, 'manifest.json')
+        os.makedirs(export_folder, exist_ok=True)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {'tables': {}, 'factsales_partitions': {}, 'exported_at': None}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+
+    def export(self):
+        """Run one incremental export; returns a summary of what was written or skipped"""
+        self._check_parquet_engine()
+        manifest = self.load_manifest()
+        summary = {'written': [], 'skipped': [], 'failed': []}
+        # Same dimension list as WAREHOUSE_TABLES (test_connection/upload_datasets); dirtydata has no stable key
+        for table in DIMENSION_TABLES:
+            self._export_dimension(table, manifest, summary)
+        self._export_factsales(manifest, summary)
+
+        manifest['exported_at'] = datetime.now().isoformat()
+        self._write_json(self.manifest_path, manifest)
+        print(f"📦 Export finished: {len(summary['written'])} written, {len(summary['skipped'])} unchanged, {len(summary['failed'])} failed")
+        return summary
+
+    def _check_parquet_engine(self):
+        # pyarrow is optional: only the export needs it, as pandas' Parquet engine
+        if importlib.util.find_spec('pyarrow') is None:
+            raise RuntimeError('Parquet export requires pyarrow: pip install pyarrow')
+
+    def _export_dimension(self, table, manifest, summary):
+        # Ordering by the natural key keeps limit/offset pages and the content hash deterministic
+        rows = self.processor.fetch_all(table, order=TABLE_KEYS[table])
+        if rows is None:
+            summary['failed'].append(table)
+            return
+        content_hash = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        entry = manifest['tables'].get(table)
+        relative_path = os.path.join('dimensions', f"{table}.parquet")
+        if entry and entry['hash'] == content_hash and os.path.exists(os.path.join(self.export_folder, relative_path)):
+            summary['skipped'].append(table)
+            return
+        self._write_parquet(pd.DataFrame(rows), relative_path)
+        manifest['tables'][table] = {
+            'path': relative_path,
+            'rows': len(rows),
+            'hash': content_hash,
+            'exported_at': datetime.now().isoformat()
+        }
+        summary['written'].append(table)
+
+    def _export_factsales(self, manifest, summary):
+        dates = self.processor.fetch_all('dimdate', params={'select': 'datekey'}, order='datekey')
+        if dates is None:
+            summary['failed'].append('factsales')
+            return
+        months = sorted({int(row['datekey']) // 100 for row in dates})
+        partitions = manifest['factsales_partitions']
+
+        for month in months:
+            month_filter = {'and': f"(datekey.gte.{month}01,datekey.lt.{month}32)"}
+            upstream_rows = self.processor.count_rows('factsales', month_filter)
+            name = f"factsales/month={month}"
+            if upstream_rows is None:
+                summary['failed'].append(name)
+                continue
+            entry = partitions.get(str(month))
+            relative_path = os.path.join('factsales', f"month={month}", 'part.parquet')
+            file_exists = os.path.exists(os.path.join(self.export_folder, relative_path))
+            if upstream_rows == 0 and entry is None:
+                continue
+            if entry and entry['rows'] == upstream_rows and file_exists:
+                summary['skipped'].append(name)
+                continue
+
+            rows = self.processor.fetch_all('factsales', params=month_filter, order=TABLE_KEYS['factsales'])
+            if rows is None:
+                summary['failed'].append(name)
+                continue
+            self._write_parquet(pd.DataFrame(rows), relative_path)
+            partitions[str(month)] = {
+                'path': relative_path,
+                'rows': len(rows),
+                'exported_at': datetime.now().isoformat()
+            }
+            summary['written'].append(name)
+
+    def _write_parquet(self, df, relative_path):
+        path = os.path.join(self.export_folder, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path, 'wb') as f:
+            df.to_parquet(f, compression=self.compression, index=False)
+
+    def _write_json(self, path, data):
+        write_json_atomic(path, data, indent=2)
@@ -0,0 +1,364 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from supabase_processor import TABLE_KEYS, UpstreamError
+
+# Drain priority; a table is also held back while any table it references still has pending rows
+DRAIN_ORDER = ['dimairlines', 'dimairports', 'dimdate', 'dimpassengers', 'dimflights', 'factsales', 'dirtydata']
+# FK targets of each table; factsales reaches dimairports/dimairlines through dimflights
+DEPENDS_ON = {
+    'dimflights': ['dimairports', 'dimairlines'],
+    'factsales': ['dimpassengers', 'dimflights', 'dimdate']
+}
+
+class SpoolFullError(Exception):
+    """The spool stayed above max_depth for longer than the enqueue timeout"""
+
+def _json_default(value):
+    # numpy scalars from DataFrame rows
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+def _without_nan(row):
+    # NaN is not valid JSON for Supabase; a missing value is null
+    return {column: None if isinstance(value, float) and math.isnan(value) else value for column, value in row.items()}
+
+class WriteBehindSpool:
+    """
+    Durable write-behind queue between /process and Supabase, backed by SQLite (WAL mode).
+
+    insert_* commit cleaned rows here at local-disk speed; a background drainer sends them to
+    Supabase in bulk requests. Rows are deduplicated while queued by (table, natural key) and
+    upstream by on_conflict + ignore-duplicates, so retries are safe.
+
+    When Supabase is unavailable (5xx, 429, auth or connection errors) rows stay pending and the
+    drainer backs off; only rows Supabase rejects (4xx such as an FK violation) count attempts.
+    A rejected batch is bisected so just the bad rows retry, and they go to a dead-letter state
+    after max_attempts. Re-enqueueing a dead row's key, or requeue_dead(), puts it back.
+    enqueue blocks while the queue is deeper than max_depth, which pushes back on loads when
+    upstream can't keep up.
+
+    Rows of hold_delivered tables are kept as 'delivered' after they reach Supabase, so they
+    still count as existing until a dimension snapshot that includes them is published and
+    purge_delivered() drops them.
+    """
+
+    def __init__(self, processor, db_path='spool.db', batch_size=500, max_depth=200000,
+                 enqueue_timeout=300, max_attempts=8, lease_seconds=120, hold_delivered=(),
+                 max_outage_backoff=60):
+        self.processor = processor
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.hold_delivered = set(hold_delivered)
+        self.max_outage_backoff = max_outage_backoff
+        self.on_delivered = None
+        self.on_idle = None
+        self.outage_backoff = 0
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._drainer = None
+        self._drained = deque()
+        self._drained_lock = threading.Lock()
+        self.last_error = None
+        self._init_db()
+
+    def _connection(self):
+        # sqlite3 connections are per-thread; every worker process opens its own
+        if not hasattr(self._local, 'connection'):
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            self._local.connection = connection
+        return self._local.connection
+
+    def _init_db(self):
+        # status: pending -> (delivered | dead); dead rows return to pending on re-enqueue or requeue
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                lease_until REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                UNIQUE (table_name, dedup_key)
+            );
+            CREATE INDEX IF NOT EXISTS spool_due ON spool (status, table_name, next_attempt_at);
+        """)
+
+    def _write(self, sql, params=()):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = connection.execute(sql, params)
+            connection.execute('COMMIT')
+            return cursor.rowcount
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    # ---------- producer side ----------
+
+    def enqueue(self, table, rows, dedup_keys=None):
+        """
+        Durably commit rows for a table; returns how many were new to the queue (or revived from
+        dead). Tables without a natural key (dirtydata) are deduplicated on dedup_keys, one per row,
+        when given; otherwise every row is queued, since identical rows can be distinct records.
+        """
+        if not rows:
+            return 0
+        self._wait_for_capacity()
+        key_column = TABLE_KEYS.get(table)
+        now = time.time()
+        records = []
+        for position, row in enumerate(rows):
+            payload = json.dumps(_without_nan(row), default=_json_default)
+            if key_column:
+                dedup_key = str(row.get(key_column))
+            elif dedup_keys is not None:
+                dedup_key = str(dedup_keys[position])
+            else:
+                dedup_key = uuid.uuid4().hex
+            records.append((table, dedup_key, payload, now))
+
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            before = connection.total_changes
+            # A key that is already pending or delivered is left alone; a dead one is retried
+            # with the new payload, so re-running a load after an outage recovers its rows
+            connection.executemany(
+                """INSERT INTO spool (table_name, dedup_key, payload, created_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (table_name, dedup_key) DO UPDATE SET
+                       payload = excluded.payload, status = 'pending', attempts = 0,
+                       next_attempt_at = 0, lease_until = 0, last_error = NULL
+                   WHERE spool.status = 'dead'""",
+                records
+            )
+            added = connection.total_changes - before
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        print(f"📝 Spooled {added} {table} rows ({len(rows) - added} already queued)")
+        return added
+
+    def _wait_for_capacity(self):
+        deadline = time.time() + self.enqueue_timeout
+        while self.depth() >= self.max_depth:
+            if time.time() > deadline:
+                raise SpoolFullError(f'Write-behind spool has been over {self.max_depth} rows for {self.enqueue_timeout}s')
+            time.sleep(0.5)
+
+    def depth(self):
+        return self._connection().execute("SELECT COUNT(*) FROM spool WHERE status = 'pending'").fetchone()[0]
+
+    def pending_count(self, tables):
+        placeholders = ','.join('?' * len(tables))
+        return self._connection().execute(
+            f"SELECT COUNT(*) FROM spool WHERE status = 'pending' AND table_name IN ({placeholders})", list(tables)
+        ).fetchone()[0]
+
+    def pending_rows(self, table):
+        """Rows that count as existing but may be missing from a snapshot: queued or delivered-and-held"""
+        rows = self._connection().execute(
+            "SELECT payload FROM spool WHERE status IN ('pending', 'delivered') AND table_name = ?", (table,)
+        ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def requeue_dead(self, table=None):
+        """Return dead-lettered rows (optionally of one table) to the queue; returns how many"""
+        sql = """UPDATE spool SET status = 'pending', attempts = 0, next_attempt_at = 0, lease_until = 0
+                 WHERE status = 'dead'"""
+        params = ()
+        if table:
+            sql += ' AND table_name = ?'
+            params = (table,)
+        requeued = self._write(sql, params)
+        print(f"♻️ Requeued {requeued} dead-letter rows")
+        return requeued
+
+    def delivered_watermark(self):
+        """Highest id of a held delivered row; take it before reading upstream for a snapshot"""
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM spool WHERE status = 'delivered'").fetchone()[0]
+
+    def purge_delivered(self, watermark):
+        """Drop held rows up to watermark once a snapshot read after they were delivered is published"""
+        return self._write("DELETE FROM spool WHERE status = 'delivered' AND id <= ?", (watermark,))
+
+    # ---------- drainer ----------
+
+    def start_drainer(self, interval=1.0):
+        if self._drainer is not None:
+            return
+        self._drainer = threading.Thread(target=self._drain_loop, args=(interval,), daemon=True)
+        self._drainer.start()
+        print("🚚 Write-behind drainer started")
+
+    def stop_drainer(self):
+        self._stop.set()
+
+    def _drain_loop(self, interval):
+        while not self._stop.is_set():
+            try:
+                drained = self.drain_once()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Spool drainer error: {str(e)}")
+                drained = 0
+            if self.outage_backoff:
+                self._stop.wait(self.outage_backoff)
+                continue
+            # Keep draining back-to-back while there is backlog; otherwise poll
+            if not drained:
+                if self.on_idle:
+                    try:
+                        self.on_idle()
+                    except Exception as e:
+                        print(f"❌ Error in spool idle callback: {str(e)}")
+                self._stop.wait(interval)
+
+    def drain_once(self):
+        """Claim and send one batch; returns the number of rows delivered"""
+        claimed = self._claim_batch()
+        if not claimed:
+            return 0
+        table, ids, rows = claimed
+        try:
+            delivered = self._deliver(table, ids, rows)
+        except UpstreamError as e:
+            # Not the rows' fault: release them without counting an attempt and back off
+            self.last_error = f'{table}: {str(e)}'
+            placeholders = ','.join('?' * len(ids))
+            self._write(f"UPDATE spool SET lease_until = 0 WHERE status = 'pending' AND id IN ({placeholders})", ids)
+            self.outage_backoff = min(self.max_outage_backoff, max(1, self.outage_backoff * 2))
+            print(f"⏳ Supabase unavailable ({str(e)}); drainer backing off {self.outage_backoff}s")
+            return 0
+        self.outage_backoff = 0
+        return delivered
+
+    def _deliver(self, table, ids, rows):
+        """
+        Send rows; on a row rejection, bisect so only the bad rows are retried. Raises
+        UpstreamError when Supabase itself is unavailable. Returns the rows delivered.
+        """
+        try:
+            inserted = self.processor.bulk_insert(table, rows)
+        except UpstreamError as e:
+            if not e.rows_rejected:
+                raise
+            if len(ids) > 1:
+                middle = len(ids) // 2
+                return self._deliver(table, ids[:middle], rows[:middle]) + self._deliver(table, ids[middle:], rows[middle:])
+            self._record_rejection(table, ids[0], str(e))
+            return 0
+
+        placeholders = ','.join('?' * len(ids))
+        if table in self.hold_delivered:
+            self._write(f"UPDATE spool SET status = 'delivered', lease_until = 0 WHERE id IN ({placeholders})", ids)
+        else:
+            self._write(f'DELETE FROM spool WHERE id IN ({placeholders})', ids)
+        with self._drained_lock:
+            self._drained.append((time.time(), len(ids)))
+        print(f"✅ Drained {len(ids)} {table} rows ({len(inserted)} new upstream)")
+        if self.on_delivered and inserted:
+            try:
+                self.on_delivered(table, inserted)
+            except Exception as e:
+                print(f"❌ Error in spool delivery callback: {str(e)}")
+        return len(ids)
+
+    def _record_rejection(self, table, row_id, error):
+        self.last_error = f'{table}: {error}'
+        self._write(
+            """UPDATE spool SET attempts = attempts + 1, lease_until = 0, last_error = ?,
+                   next_attempt_at = ? + MIN(300, (1 << attempts)),
+                   status = CASE WHEN attempts + 1 >= ? THEN 'dead' ELSE 'pending' END
+               WHERE id = ?""",
+            (error, time.time(), self.max_attempts, row_id)
+        )
+        print(f"🚫 Supabase rejected a {table} row: {error}")
+
+    def _claim_batch(self):
+        """Lease the next due batch (single table, drain order) so other workers' drainers skip it"""
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for table in DRAIN_ORDER:
+                if self._blocked(connection, table):
+                    continue
+                rows = connection.execute(
+                    """SELECT id, payload FROM spool
+                       WHERE status = 'pending' AND table_name = ? AND next_attempt_at <= ? AND lease_until <= ?
+                       ORDER BY id LIMIT ?""",
+                    (table, now, now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    ids = [row_id for row_id, _ in rows]
+                    connection.execute(
+                        f"UPDATE spool SET lease_until = ? WHERE id IN ({','.join('?' * len(ids))})",
+                        [now + self.lease_seconds] + ids
+                    )
+                    connection.execute('COMMIT')
+                    return table, ids, [json.loads(payload) for _, payload in rows]
+            connection.execute('COMMIT')
+            return None
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _blocked(self, connection, table):
+        # Any pending row of a referenced table (even one backing off or leased by another
+        # worker's drainer) may be an FK target of this table's rows, so they wait for it
+        dependencies = DEPENDS_ON.get(table)
+        if not dependencies:
+            return False
+        placeholders = ','.join('?' * len(dependencies))
+        return connection.execute(
+            f"SELECT 1 FROM spool WHERE status = 'pending' AND table_name IN ({placeholders}) LIMIT 1",
+            dependencies
+        ).fetchone() is not None
+
+    # ---------- visibility ----------
+
+    def stats(self, window_seconds=60):
+        connection = self._connection()
+        by_table = {
+            table: count for table, count in connection.execute(
+                "SELECT table_name, COUNT(*) FROM spool WHERE status = 'pending' GROUP BY table_name"
+            )
+        }
+        dead = connection.execute("SELECT COUNT(*) FROM spool WHERE status = 'dead'").fetchone()[0]
+        held = connection.execute("SELECT COUNT(*) FROM spool WHERE status = 'delivered'").fetchone()[0]
+        oldest = connection.execute("SELECT MIN(created_at) FROM spool WHERE status = 'pending'").fetchone()[0]
+        cutoff = time.time() - window_seconds
+        with self._drained_lock:
+            while self._drained and self._drained[0][0] < cutoff:
+                self._drained.popleft()
+            drained_recently = sum(count for _, count in self._drained)
+        return {
+            'depth': sum(by_table.values()),
+            'depth_by_table': by_table,
+            'dead_letter': dead,
+            'delivered_awaiting_snapshot': held,
+            'oldest_pending_seconds': round(time.time() - oldest, 1) if oldest else 0,
+            # Rate of this worker's drainer; other workers drain the same queue independently
+            'drain_rate_rows_per_second': round(drained_recently / window_seconds, 2),
+            'outage_backoff_seconds': self.outage_backoff,
+            'max_depth': self.max_depth,
+            'last_error': self.last_error
+        }
@@ -3,6 +3,105 @@ import './App.css';
 
 const API_BASE = 'http://localhost:8000';
 
+// Chunked upload settings: several chunks in flight keep the link busy, and a dropped
+// connection only costs the chunks that were in flight.
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const PARALLEL_CHUNKS = 4;
+const MAX_CHUNK_RETRIES = 5;
+
+const sha256Hex = async (buffer) => {
+  const digest = await crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+// Same file (name, size, modified time) → same session, so re-submitting resumes the upload
+const uploadKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const startOrResumeSession = async (file) => {
+  const savedSessionId = localStorage.getItem(uploadKey(file));
+  if (savedSessionId) {
+    const response = await fetch(`${API_BASE}/upload/sessions/${savedSessionId}`);
+    if (response.ok) {
+      return response.json();
+    }
+    localStorage.removeItem(uploadKey(file));
+  }
+
+  const response = await fetch(`${API_BASE}/upload/sessions`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ filename: file.name, size: file.size, chunk_size: CHUNK_SIZE }),
+  });
+  const session = await response.json();
+  if (!response.ok) {
+    throw new Error(session.error || 'Could not start upload');
+  }
+  localStorage.setItem(uploadKey(file), session.session_id);
+  return {
+    ...session,
+    missing_chunks: Array.from({ length: session.total_chunks }, (_, index) => index),
+  };
+};
+
+const uploadChunk = async (file, session, index) => {
+  const start = index * session.chunk_size;
+  const buffer = await file.slice(start, start + session.chunk_size).arrayBuffer();
+  const checksum = await sha256Hex(buffer);
+
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await fetch(`${API_BASE}/upload/sessions/${session.session_id}/chunks/${index}`, {
+        method: 'PUT',
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'X-Chunk-SHA256': checksum,
+        },
+        body: buffer,
+      });
+      if (response.ok) {
+        return;
+      }
+    } catch (error) {
+      console.error(`Chunk ${index} attempt ${attempt} failed:`, error);
+    }
+    if (attempt >= MAX_CHUNK_RETRIES) {
+      throw new Error(`Chunk ${index} failed after ${attempt} attempts`);
+    }
+    await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** attempt));
+  }
+};
+
+const uploadFileInChunks = async (file, onProgress) => {
+  const session = await startOrResumeSession(file);
+  const queue = [...session.missing_chunks];
+  let completed = session.total_chunks - queue.length;
+  onProgress(completed, session.total_chunks);
+
+  const worker = async () => {
+    while (queue.length > 0) {
+      const index = queue.shift();
+      await uploadChunk(file, session, index);
+      completed += 1;
+      onProgress(completed, session.total_chunks);
+    }
+  };
+  await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
+
+  const response = await fetch(`${API_BASE}/upload/sessions/${session.session_id}/finalize`, {
+    method: 'POST',
+  });
+  const result = await response.json();
+  if (!response.ok) {
+    throw new Error(result.error || 'Could not finalize upload');
+  }
+  localStorage.removeItem(uploadKey(file));
+  return result;
+};
+
 function App() {
   const [activeTab, setActiveTab] = useState('upload');
   const [selectedFile, setSelectedFile] = useState(null);
@@ -23,43 +122,33 @@ function App() {
       return;
     }
 
-    const formData = new FormData();
-    formData.append('file', selectedFile);
-
     try {
       setUploadStatus('Uploading...');
       
-      const response = await fetch(`${API_BASE}/upload`, {
-        method: 'POST',
-        body: formData,
+      const result = await uploadFileInChunks(selectedFile, (completed, total) => {
+        setUploadStatus(`Uploading... ${completed}/${total} chunks`);
       });
 
-      const result = await response.json();
+      setUploadStatus('File uploaded! Now processing...');
       
-      if (response.ok) {
-        setUploadStatus('File uploaded! Now processing...');
-        
-        // Process the file
-        const processResponse = await fetch(`${API_BASE}/process`, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({ file_path: result.file_path }),
-        });
+      // Process the file
+      const processResponse = await fetch(`${API_BASE}/process`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ file_path: result.file_path }),
+      });
 
-        const processResult = await processResponse.json();
-        
-        if (processResponse.ok) {
-          setUploadStatus(`✅ Success! ${processResult.clean_rows} clean rows processed, ${processResult.dirty_rows} moved to DirtyData`);
-        } else {
-          setUploadStatus('❌ Processing failed');
-        }
+      const processResult = await processResponse.json();
+      
+      if (processResponse.ok) {
+        setUploadStatus(`✅ Success! ${processResult.clean_rows} clean rows processed, ${processResult.dirty_rows} moved to DirtyData`);
       } else {
-        setUploadStatus('❌ Upload failed');
+        setUploadStatus('❌ Processing failed');
       }
     } catch (error) {
-      setUploadStatus('❌ Error uploading file');
+      setUploadStatus('❌ Error uploading file - submit the same file again to resume');
       console.error('Upload error:', error);
     }
   };